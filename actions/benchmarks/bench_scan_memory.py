@@ -0,0 +1,64 @@
+"""Compare peak memory of the scan phase with and without workflow texts.
+
+Run from the ``actions`` directory::
+
+    python -m benchmarks.bench_scan_memory
+"""
+
+from __future__ import annotations
+
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+from update_actions import scanner, updater
+
+FILE_COUNT = 2000
+STEPS_PER_FILE = 40
+
+
+def write_tree(root: Path) -> list[Path]:
+    paths = []
+    for index in range(FILE_COUNT):
+        steps = "".join(
+            f"      - name: Step {step}\n"
+            f"        uses: actions/checkout@v{step % 4 + 1}\n"
+            f"        with:\n          path: dir-{index}-{step}\n"
+            for step in range(STEPS_PER_FILE)
+        )
+        path = root / f"ci-{index}.yml"
+        path.write_text(f"jobs:\n  build:\n    steps:\n{steps}", encoding="utf-8")
+        paths.append(path)
+    return paths
+
+
+def locations_and_text(path: Path) -> tuple[list[tuple[int | None, str]], str]:
+    # The earlier scan result: the locations and the text of each file.
+    text = path.read_text(encoding="utf-8")
+    return scanner._locate_uses(path, text), text
+
+
+def peak(function, *args) -> int:
+    tracemalloc.start()
+    result = function(*args)
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return peak_bytes
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        paths = write_tree(Path(tmpdir))
+        cases = {
+            "locations and text": lambda: [locations_and_text(path) for path in paths],
+            "locations only": lambda: updater.scan_workflow_files(paths, jobs=1),
+        }
+
+        print(f"{FILE_COUNT} files, {STEPS_PER_FILE} steps per file")
+        for name, case in cases.items():
+            print(f"{name:20} {peak(case) / 2**20:9.1f} MiB peak")
+
+
+if __name__ == "__main__":
+    main()
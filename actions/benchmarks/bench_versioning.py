@@ -0,0 +1,71 @@
+"""Compare release tag selection with and without ``VersionIndex``.
+
+Run from the ``actions`` directory::
+
+    python -m benchmarks.bench_versioning
+"""
+
+from __future__ import annotations
+
+import random
+import timeit
+
+from update_actions import versioning
+
+TAG_COUNT = 5000
+QUERY_COUNT = 200
+
+
+def make_tags(count: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    tags = set()
+    while len(tags) < count:
+        major, minor, patch = rng.randint(1, 40), rng.randint(0, 30), rng.randint(0, 9)
+        tag = rng.choice([f"v{major}.{minor}.{patch}", f"{major}.{minor}.{patch}"])
+        tags.add(rng.choice([tag, tag, tag, f"{tag}-rc.1"]))
+    return sorted(tags, key=lambda _: rng.random())
+
+
+def select_latest_unindexed(tags: list[str]) -> str | None:
+    # The selection before VersionIndex: parse every tag on every query.
+    parse = versioning.version_key.__wrapped__
+    best_tag = None
+    best_key = None
+    for tag in tags:
+        key = parse(tag)
+        if key is not None and (best_key is None or key > best_key):
+            best_key = key
+            best_tag = tag
+    return best_tag
+
+
+def main() -> None:
+    tags = make_tags(TAG_COUNT)
+    majors = [random.Random(1).randint(1, 40) for _ in range(QUERY_COUNT)]
+
+    index = versioning.VersionIndex(tags)
+    assert index.latest() == select_latest_unindexed(tags)
+
+    cases = {
+        "unindexed latest": lambda: [
+            select_latest_unindexed(tags) for _ in range(QUERY_COUNT)
+        ],
+        "index build (cold parse)": lambda: (
+            versioning.version_key.cache_clear(),
+            versioning.VersionIndex(tags),
+        ),
+        "index build (memoized parse)": lambda: versioning.VersionIndex(tags),
+        "index latest": lambda: [index.latest() for _ in range(QUERY_COUNT)],
+        "index latest in major": lambda: [index.latest_in_major(m) for m in majors],
+        "index newer than": lambda: [index.newer_than((m, 0, 0)) for m in majors],
+    }
+
+    print(f"{TAG_COUNT} tags, {QUERY_COUNT} queries per run")
+    for name, case in cases.items():
+        runs = 5
+        best = min(timeit.repeat(case, number=1, repeat=runs))
+        print(f"{name:30} {best * 1000:9.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,27 @@ import argparse
 import os
 from pathlib import Path
 
-from update_actions.updater import update_actions
+from update_actions.updater import (
+    DEFAULT_MAX_CONCURRENCY,
+    PARALLEL_SCAN_THRESHOLD,
+    RELEASE_SOURCES,
+    update_actions,
+    update_actions_batch,
+)
+
+
+def positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"{value} is not a positive integer")
+    return number
+
+
+def non_negative_int(value: str) -> int:
+    number = int(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"{value} is a negative integer")
+    return number
 
 
 def parse_args() -> argparse.Namespace:
@@ -12,8 +32,28 @@ def parse_args() -> argparse.Namespace:
     )
     parser.add_argument(
         "--root",
-        default=os.environ.get("GITHUB_WORKSPACE", "."),
-        help="Repository root to scan. The default is GITHUB_WORKSPACE or .",
+        action="append",
+        default=[],
+        help=(
+            "Repository root to scan. The default is GITHUB_WORKSPACE or . "
+            "Repeat the option to update many roots in batch mode."
+        ),
+    )
+    parser.add_argument(
+        "--roots-file",
+        default="",
+        help=(
+            "File with one repository root per line, for batch mode. Blank "
+            "lines and lines that start with # are ignored."
+        ),
+    )
+    parser.add_argument(
+        "--records-dir",
+        default="",
+        help=(
+            "Directory for the per-root update records in batch mode. "
+            "Required with more than one root."
+        ),
     )
     parser.add_argument(
         "--file-glob",
@@ -33,21 +73,92 @@ def parse_args() -> argparse.Namespace:
         action="store_true",
         help="Print planned updates. Do not modify files.",
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--max-concurrency",
+        type=positive_int,
+        default=DEFAULT_MAX_CONCURRENCY,
+        help=(
+            "Maximum number of concurrent release lookups. "
+            f"The default is {DEFAULT_MAX_CONCURRENCY}."
+        ),
+    )
+    parser.add_argument(
+        "--release-source",
+        choices=RELEASE_SOURCES,
+        default="rest",
+        help=(
+            "Release lookup backend. rest requests every release page of each "
+            "repository. graphql resolves many repositories per request. "
+            "stream stops paging when a page cannot hold a newer version. "
+            "git lists all tags with one git ls-remote call per repository."
+        ),
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default="",
+        help=(
+            "Directory for cached release lists and scan results. REST lookups "
+            "send conditional requests and reuse unchanged lists. Only changed "
+            "workflow files are parsed. An empty value disables the cache."
+        ),
+    )
+    parser.add_argument(
+        "--jobs",
+        type=non_negative_int,
+        default=0,
+        help=(
+            "Number of processes that parse workflow files. The default, 0, "
+            f"uses one process per CPU from {PARALLEL_SCAN_THRESHOLD} files."
+        ),
+    )
+    parser.add_argument(
+        "--full-rescan",
+        action="store_true",
+        help="Parse every workflow file and replace the cached scan results.",
+    )
+    args = parser.parse_args()
+
+    if args.roots_file:
+        try:
+            lines = Path(args.roots_file).read_text(encoding="utf-8").splitlines()
+        except OSError as exc:
+            parser.error(f"cannot read --roots-file: {exc}")
+        args.root.extend(
+            line.strip()
+            for line in lines
+            if line.strip() and not line.lstrip().startswith("#")
+        )
+    if not args.root:
+        if args.roots_file:
+            parser.error(f"{args.roots_file} lists no roots")
+        args.root = [os.environ.get("GITHUB_WORKSPACE", ".")]
+    if len(args.root) > 1 and not args.records_dir:
+        parser.error("--records-dir is required with more than one root")
+    return args
 
 
 def main() -> int:
     args = parse_args()
-    root = Path(args.root).resolve()
+    roots = [Path(root).resolve() for root in args.root]
     excluded_actions = [
         p.strip() for p in args.excluded_actions.split(",") if p.strip()
     ]
-    return update_actions(
-        root=root,
+    options = dict(
         file_glob=args.file_glob,
         excluded_actions=excluded_actions,
         dry_run=args.dry_run,
+        max_concurrency=args.max_concurrency,
+        release_source=args.release_source,
+        cache_dir=Path(args.cache_dir).resolve() if args.cache_dir else None,
+        jobs=args.jobs,
+        full_rescan=args.full_rescan,
     )
+    if args.records_dir:
+        return update_actions_batch(
+            roots=roots, records_dir=Path(args.records_dir).resolve(), **options
+        )
+
+    return update_actions(root=roots[0], **options)
 
 
 if __name__ == "__main__":
@@ -1,33 +1,433 @@
+from __future__ import annotations
+
+import base64
+import contextlib
+import itertools
+import json
+import os
+import re
 import subprocess
 import sys
+import urllib.error
+import urllib.request
+from email.message import Message
+from typing import Iterable, Iterator
+
+from update_actions.rate_limit import RequestScheduler
+from update_actions.release_cache import CachedReleases, ReleaseCache
+from update_actions.versioning import parse_version
+
+GRAPHQL_BATCH_SIZE = 50
+RELEASES_PER_PAGE = 100
+
+_NEXT_LINK_RE = re.compile(r'<([^>]+)>\s*;\s*rel="next"')
+
+# Every lookup in this module goes through the active scheduler. The updater
+# installs a new scheduler for each run with ``use_scheduler``.
+_scheduler = RequestScheduler()
+
+
+@contextlib.contextmanager
+def use_scheduler(scheduler: RequestScheduler) -> Iterator[RequestScheduler]:
+    """Route the lookups in this block through ``scheduler``."""
+    global _scheduler
+    previous = _scheduler
+    _scheduler = scheduler
+    try:
+        yield scheduler
+    finally:
+        _scheduler = previous
+
+
+# Request releases newest first, as the REST endpoint does. Each alias resolves
+# one repository. A cursor continues a repository with more than 100 releases.
+_GRAPHQL_REPOSITORY = """
+  r{index}: repository(owner: $owner{index}, name: $name{index}) {{
+    releases(
+      first: 100
+      after: $after{index}
+      orderBy: {{field: CREATED_AT, direction: DESC}}
+    ) {{
+      nodes {{ tagName isPrerelease }}
+      pageInfo {{ hasNextPage endCursor }}
+    }}
+  }}"""
 
 
 def fetch_release_tags(repo: str) -> list[str]:
-    cmd = [
-        "gh",
-        "api",
-        f"/repos/{repo}/releases",
-        "--paginate",
-        "--jq",
-        ".[] | [.tag_name, .prerelease] | @tsv",
-    ]
-    result = subprocess.run(cmd, capture_output=True, text=True, check=False)
-    if result.returncode != 0:
+    """Return the non-prerelease tags of every release page of ``repo``.
+
+    Each page is one request through the scheduler. The scheduler then sees
+    the rate-limit headers of every page and counts every page in its report.
+    """
+    url = _api_url(f"/repos/{repo}/releases?per_page={RELEASES_PER_PAGE}")
+    tags: list[str] = []
+    try:
+        for page in _iter_release_pages(url):
+            for release in page:
+                if not release.get("prerelease"):
+                    tags.append(release["tag_name"])
+    except (urllib.error.URLError, OSError, ValueError, KeyError, TypeError) as exc:
         print(
-            f"::warning::Release lookup failed for {repo}: {result.stderr.strip()}",
+            f"::warning::Release lookup failed for {repo}: {exc}",
             file=sys.stderr,
         )
         return []
 
+    return tags
+
+
+def fetch_release_tags_ls_remote(repo: str) -> list[str]:
+    """Return the tag names of ``repo`` from one ``git ls-remote`` call.
+
+    Tags need no release, so this lists every tag, not only released ones.
+    ``git`` sends all refs in one response and does not use the API rate limit.
+    Read its output line by line and keep only the tag names.
+    """
+    server = os.environ.get("GITHUB_SERVER_URL", "https://github.com").rstrip("/")
+    cmd = ["git", "ls-remote", "--tags", "--refs", f"{server}/{repo}.git"]
+    env = {**os.environ, "GIT_TERMINAL_PROMPT": "0", **_git_auth_env(server)}
+    try:
+        process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            env=env,
+        )
+    except OSError as exc:
+        print(f"::warning::Tag lookup failed for {repo}: {exc}", file=sys.stderr)
+        return []
+
     tags = []
-    for line in result.stdout.splitlines():
-        if not line.strip():
-            continue
+    with process:
+        for line in process.stdout:
+            _, _, ref = line.rstrip("\n").partition("\t")
+            if ref.startswith("refs/tags/"):
+                tags.append(ref[len("refs/tags/") :])
+        stderr = process.stderr.read()
+
+    if process.returncode != 0:
+        print(
+            f"::warning::Tag lookup failed for {repo}: {stderr.strip()}",
+            file=sys.stderr,
+        )
+        return []
+
+    return tags
+
+
+def _git_auth_env(server: str) -> dict[str, str]:
+    # Pass the token through the environment, like actions/checkout, so it
+    # does not show up in the process list.
+    token = os.environ.get("GH_TOKEN") or os.environ.get("GITHUB_TOKEN")
+    if not token or not server.startswith("https://"):
+        return {}
+    credentials = base64.b64encode(f"x-access-token:{token}".encode()).decode()
+    return {
+        "GIT_CONFIG_COUNT": "1",
+        "GIT_CONFIG_KEY_0": f"http.{server}/.extraheader",
+        "GIT_CONFIG_VALUE_0": f"AUTHORIZATION: basic {credentials}",
+    }
+
+
+def _auth_headers() -> dict[str, str]:
+    # Use the same token variables as ``gh``.
+    token = os.environ.get("GH_TOKEN") or os.environ.get("GITHUB_TOKEN")
+    if not token:
+        return {}
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _report_retry(target: str, delay: float) -> None:
+    print(
+        f"::notice::GitHub API rate limit reached for {target}. "
+        f"Retry in {delay:.0f} s.",
+        file=sys.stderr,
+    )
+
+
+def _is_rate_limited(exc: urllib.error.HTTPError) -> bool:
+    if exc.code == 429:
+        return True
+    if exc.code != 403 or exc.headers is None:
+        return False
+    return (
+        exc.headers.get("Retry-After") is not None
+        or exc.headers.get("X-RateLimit-Remaining") == "0"
+    )
+
+
+def _send(request: urllib.request.Request) -> tuple[int, Message, bytes]:
+    """Send ``request`` through the scheduler. Retry rate-limited responses.
+
+    Return a 304 response instead of raising.
+    """
+    scheduler = _scheduler
+    attempt = 0
+    while True:
+        scheduler.acquire()
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                scheduler.observe(response.headers)
+                return response.status, response.headers, response.read()
+        except urllib.error.HTTPError as exc:
+            scheduler.observe(exc.headers)
+            if exc.code == 304:
+                return exc.code, exc.headers, b""
+
+            if not _is_rate_limited(exc):
+                raise
+            delay = scheduler.backoff(exc.headers, attempt)
+            if delay is None:
+                raise
+            _report_retry(request.full_url, delay)
+            attempt += 1
+
+
+def _rest_get(url: str, headers: dict[str, str]) -> tuple[int, Message, bytes]:
+    """Send a GET request. Return a 304 response instead of raising."""
+    request = urllib.request.Request(
+        url,
+        headers={
+            "Accept": "application/vnd.github+json",
+            **_auth_headers(),
+            **headers,
+        },
+    )
+    return _send(request)
+
+
+def _api_url(path: str) -> str:
+    # GitHub Actions sets GITHUB_API_URL. It differs on GitHub Enterprise Server.
+    api_url = os.environ.get("GITHUB_API_URL", "https://api.github.com")
+    return f"{api_url.rstrip('/')}{path}"
+
 
-        tag, prerelease = line.split("\t", 1)
-        if prerelease.strip().lower() == "true":
+def _iter_release_pages(url: str) -> Iterator[list[dict]]:
+    """Yield release pages from ``url`` and request each next page on demand."""
+    next_url: str | None = url
+    while next_url is not None:
+        _, headers, body = _rest_get(next_url, {})
+        yield json.loads(body)
+        next_link = _NEXT_LINK_RE.search(headers.get("Link", ""))
+        next_url = next_link.group(1) if next_link else None
+
+
+def fetch_release_tags_streaming(repo: str) -> list[str]:
+    """Return non-prerelease tags up to the page that cannot raise the maximum.
+
+    ``/releases/latest`` gives a first candidate. Release pages follow, newest
+    first. A full page without a version above the best version so far ends
+    the walk, because older pages hold older releases. The result can omit old
+    tags, but ``select_latest_tag`` selects the same tag as for the full list.
+    """
+    tags: list[str] = []
+    best = None
+    try:
+        _, _, body = _rest_get(_api_url(f"/repos/{repo}/releases/latest"), {})
+        latest_tag = json.loads(body)["tag_name"]
+    except (urllib.error.URLError, OSError, ValueError, KeyError, TypeError):
+        # A repository without releases returns 404. The page walk reports
+        # other failures.
+        pass
+    else:
+        tags.append(latest_tag)
+        best = parse_version(latest_tag)
+
+    url = _api_url(f"/repos/{repo}/releases?per_page={RELEASES_PER_PAGE}")
+    try:
+        for page in _iter_release_pages(url):
+            raised = False
+            for release in page:
+                if release.get("prerelease"):
+                    continue
+
+                tag = release["tag_name"]
+                tags.append(tag)
+                version = parse_version(tag)
+                if version is not None and (best is None or version > best):
+                    best = version
+                    raised = True
+
+            if best is not None and not raised and len(page) >= RELEASES_PER_PAGE:
+                break
+    except (urllib.error.URLError, OSError, ValueError, KeyError, TypeError) as exc:
+        print(
+            f"::warning::Release lookup failed for {repo}: {exc}",
+            file=sys.stderr,
+        )
+        return []
+
+    return tags
+
+
+def fetch_release_tags_cached(repo: str, cache: ReleaseCache) -> list[str]:
+    """Return non-prerelease tags with a conditional request for cached repos.
+
+    The first release page carries the validators because the API lists
+    releases newest first. A new release changes that page. A 304 response
+    serves the cached list and does not count against the REST rate limit.
+    Other responses fetch every page and replace the cache entry.
+    """
+    url = _api_url(f"/repos/{repo}/releases?per_page={RELEASES_PER_PAGE}")
+    cached = cache.get(repo)
+    headers = {}
+    if cached is not None:
+        if cached.etag:
+            headers["If-None-Match"] = cached.etag
+        if cached.last_modified:
+            headers["If-Modified-Since"] = cached.last_modified
+
+    tags: list[str] = []
+    try:
+        status, response_headers, body = _rest_get(url, headers)
+        if status == 304 and cached is not None:
+            cache.put(repo, cached)
+            return cached.tags
+
+        etag = response_headers.get("ETag")
+        last_modified = response_headers.get("Last-Modified")
+        pages: Iterable[list[dict]] = [json.loads(body)]
+        next_link = _NEXT_LINK_RE.search(response_headers.get("Link", ""))
+        if next_link is not None:
+            pages = itertools.chain(pages, _iter_release_pages(next_link.group(1)))
+        for page in pages:
+            for release in page:
+                if not release.get("prerelease"):
+                    tags.append(release["tag_name"])
+    except (urllib.error.URLError, OSError, ValueError, KeyError, TypeError) as exc:
+        print(
+            f"::warning::Release lookup failed for {repo}: {exc}",
+            file=sys.stderr,
+        )
+        return []
+
+    cache.put(repo, CachedReleases(tags=tags, etag=etag, last_modified=last_modified))
+    return tags
+
+
+def _graphql_request(query: str, variables: dict[str, str | None]) -> dict:
+    """Send one GraphQL request and return the decoded response body.
+
+    ``GITHUB_GRAPHQL_URL`` selects the endpoint. GitHub Actions sets it for
+    GitHub Enterprise Server. ``GH_TOKEN`` or ``GITHUB_TOKEN`` authenticates the
+    request, as it does for ``gh``.
+    """
+    url = os.environ.get("GITHUB_GRAPHQL_URL", "https://api.github.com/graphql")
+    headers = {
+        "Content-Type": "application/json",
+        "Accept": "application/json",
+        **_auth_headers(),
+    }
+
+    body = json.dumps({"query": query, "variables": variables}).encode("utf-8")
+    request = urllib.request.Request(url, data=body, headers=headers, method="POST")
+    attempt = 0
+    while True:
+        _, response_headers, payload = _send(request)
+        response = json.loads(payload)
+        # GraphQL reports an exhausted point budget in the response body.
+        errors = response.get("errors") or []
+        if not any(error.get("type") == "RATE_LIMITED" for error in errors):
+            return response
+
+        delay = _scheduler.backoff(response_headers, attempt)
+        if delay is None:
+            return response
+        _report_retry(url, delay)
+        attempt += 1
+
+
+def fetch_release_tags_graphql(
+    repos: list[str], batch_size: int = GRAPHQL_BATCH_SIZE
+) -> dict[str, list[str]]:
+    """Return non-prerelease tags for many repositories with GraphQL.
+
+    Each request resolves up to ``batch_size`` repositories through aliased
+    ``repository`` fields. A repository with more than 100 releases stays in
+    the queue with its cursor until the last page. Failed lookups log a GitHub
+    Actions warning and return an empty list, as ``fetch_release_tags`` does.
+    """
+    tags: dict[str, list[str]] = {repo: [] for repo in repos}
+    cursors: dict[str, str | None] = {}
+    for repo in tags:
+        if repo.count("/") != 1:
+            print(
+                f"::warning::Release lookup failed for {repo}: "
+                "expected an owner/name repository",
+                file=sys.stderr,
+            )
             continue
+        cursors[repo] = None
 
-        tags.append(tag.strip())
+    while cursors:
+        pending = list(cursors.items())
+        cursors = {}
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start : start + batch_size]
+            cursors.update(_fetch_graphql_batch(batch, tags))
 
     return tags
+
+
+def _fetch_graphql_batch(
+    batch: list[tuple[str, str | None]], tags: dict[str, list[str]]
+) -> dict[str, str | None]:
+    """Resolve one batch into ``tags``. Return cursors for incomplete repos."""
+    declarations = []
+    fields = []
+    variables: dict[str, str | None] = {}
+    for index, (repo, cursor) in enumerate(batch):
+        owner, name = repo.split("/")
+        declarations.append(
+            f"$owner{index}: String!, $name{index}: String!, $after{index}: String"
+        )
+        fields.append(_GRAPHQL_REPOSITORY.format(index=index))
+        variables.update(
+            {f"owner{index}": owner, f"name{index}": name, f"after{index}": cursor}
+        )
+    query = f"query({', '.join(declarations)}) {{{''.join(fields)}\n}}"
+
+    try:
+        response = _graphql_request(query, variables)
+    except (urllib.error.URLError, OSError, ValueError) as exc:
+        for repo, _ in batch:
+            tags[repo] = []
+            print(
+                f"::warning::Release lookup failed for {repo}: {exc}",
+                file=sys.stderr,
+            )
+        return {}
+
+    # GraphQL reports a missing repository as a null alias plus an error entry
+    # whose path starts with that alias.
+    errors: dict[str, str] = {}
+    for error in response.get("errors") or []:
+        path = error.get("path") or [""]
+        errors.setdefault(str(path[0]), error.get("message", "unknown error"))
+
+    data = response.get("data") or {}
+    next_cursors: dict[str, str | None] = {}
+    for index, (repo, _) in enumerate(batch):
+        alias = f"r{index}"
+        repository = data.get(alias)
+        if not repository:
+            message = errors.get(alias) or next(iter(errors.values()), "no data")
+            tags[repo] = []
+            print(
+                f"::warning::Release lookup failed for {repo}: {message}",
+                file=sys.stderr,
+            )
+            continue
+
+        releases = repository["releases"]
+        for node in releases["nodes"]:
+            if not node["isPrerelease"]:
+                tags[repo].append(node["tagName"])
+
+        page_info = releases["pageInfo"]
+        if page_info["hasNextPage"]:
+            next_cursors[repo] = page_info["endCursor"]
+
+    return next_cursors
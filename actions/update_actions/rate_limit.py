@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Mapping
+
+DEFAULT_RATE = 10.0
+DEFAULT_BURST = 10
+MIN_RATE = 0.05
+# Pace requests against the reset time only when the remaining budget drops
+# below this share of the limit, or below LOW_WATER_REQUESTS without a limit.
+# A healthy budget keeps the base rate.
+LOW_WATER_FRACTION = 0.1
+LOW_WATER_REQUESTS = 100
+MAX_RETRIES = 3
+MAX_BACKOFF_SECONDS = 300.0
+
+# GitHub asks clients to wait at least one minute after a secondary rate limit
+# response without Retry-After, with a longer wait for each repeat.
+SECONDARY_LIMIT_BACKOFF_SECONDS = 60.0
+
+
+def _int_header(headers: Mapping[str, str] | None, name: str) -> int | None:
+    if headers is None:
+        return None
+    value = headers.get(name)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+class RequestScheduler:
+    """Pace GitHub API requests and adapt to the rate-limit headers.
+
+    ``acquire`` takes a token from a bucket that refills at ``rate`` requests
+    per second. ``observe`` reads ``X-RateLimit-Remaining`` and
+    ``X-RateLimit-Reset``. When the remaining budget runs low, it lowers the
+    rate so the budget lasts until the reset. ``backoff`` pauses every caller
+    after a rate-limited response, for ``Retry-After`` seconds when the
+    response sets it. The scheduler is shared by the lookup threads, so all
+    state changes hold a lock.
+    """
+
+    def __init__(
+        self,
+        rate: float = DEFAULT_RATE,
+        burst: int = DEFAULT_BURST,
+        max_retries: int = MAX_RETRIES,
+        clock: Callable[[], float] = time.monotonic,
+        wall_clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.base_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self._clock = clock
+        self._wall_clock = wall_clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._paused_until = 0.0
+
+        self.requests = 0
+        self.retries = 0
+        self.waited = 0.0
+        self.limit: int | None = None
+        self.remaining: int | None = None
+        self.reset: int | None = None
+
+    def acquire(self) -> None:
+        """Wait until the bucket and any rate-limit pause allow a request."""
+        with self._lock:
+            now = self._clock()
+            elapsed = now - self._updated
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+            self._updated = now
+            # Reserve the token now. A negative balance queues later callers
+            # behind this one.
+            self._tokens -= 1
+            wait = max(self._paused_until - now, -self._tokens / self.rate, 0.0)
+            self.requests += 1
+            self.waited += wait
+
+        if wait > 0:
+            self._sleep(wait)
+
+    def observe(self, headers: Mapping[str, str] | None) -> None:
+        """Update the budget from the rate-limit headers of a response."""
+        remaining = _int_header(headers, "X-RateLimit-Remaining")
+        limit = _int_header(headers, "X-RateLimit-Limit")
+        reset = _int_header(headers, "X-RateLimit-Reset")
+        with self._lock:
+            if limit is not None:
+                self.limit = limit
+            if reset is not None:
+                self.reset = reset
+            if remaining is not None:
+                self.remaining = remaining
+
+            target = self.base_rate
+            if remaining is not None and reset is not None:
+                window = reset - self._wall_clock()
+                if window > 0:
+                    if remaining == 0:
+                        self._paused_until = max(
+                            self._paused_until, self._clock() + window
+                        )
+                    if remaining < self._low_water():
+                        # Spread the remaining budget over the time until reset.
+                        target = min(target, max(remaining / window, MIN_RATE))
+
+            # Slow down at once. Speed up again in small steps.
+            if target < self.rate:
+                self.rate = target
+            else:
+                self.rate = min(target, self.rate + self.base_rate / 10)
+
+    def _low_water(self) -> float:
+        if self.limit is None:
+            return LOW_WATER_REQUESTS
+        return self.limit * LOW_WATER_FRACTION
+
+    def backoff(self, headers: Mapping[str, str] | None, attempt: int) -> float | None:
+        """Pause after a rate-limited response and return the delay.
+
+        Return None when ``attempt`` has used every retry.
+        """
+        if attempt >= self.max_retries:
+            return None
+
+        retry_after = _int_header(headers, "Retry-After")
+        remaining = _int_header(headers, "X-RateLimit-Remaining")
+        reset = _int_header(headers, "X-RateLimit-Reset")
+        if retry_after is not None:
+            delay = float(retry_after)
+        elif remaining == 0 and reset is not None:
+            delay = reset - self._wall_clock() + 1
+        else:
+            delay = SECONDARY_LIMIT_BACKOFF_SECONDS * 2**attempt
+        delay = min(max(delay, 1.0), MAX_BACKOFF_SECONDS)
+
+        with self._lock:
+            self.retries += 1
+            self.rate = max(self.rate / 2, MIN_RATE)
+            self._paused_until = max(self._paused_until, self._clock() + delay)
+        return delay
+
+    def report(self) -> str:
+        message = (
+            f"GitHub API budget: {self.requests} requests, "
+            f"{self.retries} rate-limited retries, {self.waited:.1f} s paced."
+        )
+        if self.remaining is not None and self.limit is not None:
+            message += f" Remaining: {self.remaining} of {self.limit}"
+            if self.reset is not None:
+                reset = datetime.fromtimestamp(self.reset, tz=timezone.utc)
+                message += f", resets at {reset:%H:%M:%S} UTC"
+            message += "."
+        return message
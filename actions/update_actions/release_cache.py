@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+@dataclass(frozen=True)
+class CachedReleases:
+    tags: list[str]
+    etag: str | None
+    last_modified: str | None
+
+
+class ReleaseCache:
+    """Store release tag lists on disk with their HTTP validators.
+
+    Each repository has one JSON file. A lookup returns an entry only when it
+    was stored or revalidated within ``ttl`` seconds. ``prune`` removes expired
+    entries, then removes the least recently used entries until the directory
+    is at most ``max_bytes``.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        ttl: float = DEFAULT_TTL_SECONDS,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ) -> None:
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, repo: str) -> Path:
+        # Hash the repository name. Owner and repository names are not valid
+        # file names on every platform, and the hash keeps the directory flat.
+        digest = hashlib.sha256(repo.lower().encode("utf-8")).hexdigest()
+        return self.directory / f"{digest[:32]}.json"
+
+    def get(self, repo: str) -> CachedReleases | None:
+        path = self._path(repo)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+        if time.time() - entry.get("stored_at", 0) > self.ttl:
+            path.unlink(missing_ok=True)
+            return None
+
+        # The modification time records the last use for LRU eviction.
+        os.utime(path)
+        return CachedReleases(
+            tags=entry["tags"],
+            etag=entry.get("etag"),
+            last_modified=entry.get("last_modified"),
+        )
+
+    def put(self, repo: str, releases: CachedReleases) -> None:
+        entry = {
+            "repo": repo,
+            "stored_at": time.time(),
+            "etag": releases.etag,
+            "last_modified": releases.last_modified,
+            "tags": releases.tags,
+        }
+        # Write through a temporary file. Concurrent lookups and interrupted
+        # runs never leave a partial entry.
+        fd, tmp_name = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as tmp:
+            json.dump(entry, tmp)
+        os.replace(tmp_name, self._path(repo))
+
+    def prune(self) -> None:
+        now = time.time()
+        entries: list[tuple[float, int, Path]] = []
+        for path in self.directory.glob("*.json"):
+            try:
+                entry = json.loads(path.read_text(encoding="utf-8"))
+                stat = path.stat()
+            except (OSError, ValueError):
+                path.unlink(missing_ok=True)
+                continue
+
+            if now - entry.get("stored_at", 0) > self.ttl:
+                path.unlink(missing_ok=True)
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+
+# Increase when the scanner changes what it extracts. A manifest from another
+# version is ignored.
+MANIFEST_VERSION = 1
+
+
+class ScanManifest:
+    """Store extracted 'uses' locations by file path and content hash.
+
+    A file whose content hash matches its entry reuses the stored locations
+    and is not parsed again.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.files: dict[str, dict] = {}
+        self.changed = False
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+
+        if isinstance(data, dict) and data.get("version") == MANIFEST_VERSION:
+            self.files = data.get("files", {})
+
+    @staticmethod
+    def digest(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+
+    def get(self, path: Path, digest: str) -> list[tuple[int | None, str]] | None:
+        entry = self.files.get(str(path))
+        if entry is None or entry.get("sha256") != digest:
+            return None
+        return [(line, value) for line, value in entry["uses"]]
+
+    def put(
+        self, path: Path, digest: str, locations: list[tuple[int | None, str]]
+    ) -> None:
+        self.files[str(path)] = {"sha256": digest, "uses": locations}
+        self.changed = True
+
+    def clear(self) -> None:
+        self.files = {}
+        self.changed = True
+
+    def save(self) -> None:
+        # Drop entries for deleted files so the manifest does not grow forever.
+        for name in [name for name in self.files if not Path(name).is_file()]:
+            del self.files[name]
+            self.changed = True
+
+        if not self.changed:
+            return
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as tmp:
+            json.dump({"version": MANIFEST_VERSION, "files": self.files}, tmp)
+        os.replace(tmp_name, self.path)
+        self.changed = False
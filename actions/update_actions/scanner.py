@@ -1,36 +1,56 @@
 from __future__ import annotations
 
+import re
 import sys
 from pathlib import Path
-from typing import Literal
+from typing import Iterator, Literal
 
 from ruamel.yaml import YAML
 
 
-def find_uses(obj) -> list[str]:
-    """Find all 'uses' values in a YAML structure."""
-    found = []
+def iter_uses(obj) -> Iterator[tuple[dict, str]]:
+    """Yield (mapping, key) for each string 'uses' value in ``obj``.
+
+    Walk the structure once with an explicit stack, in document order. Deep
+    generated YAML cannot exceed the recursion limit. The mapping is yielded
+    before its children are visited, so callers can replace the value.
+    """
+    stack = [obj]
+    while stack:
+        node = stack.pop()
+
+        # Lists can occur in jobs, steps, and matrices. Search each item
+        # because action references are not limited to jobs.<job>.steps.
+        if isinstance(node, list):
+            stack.extend(reversed(node))
+            continue
 
-    # Lists can occur in jobs, steps, and matrices. Search each item because
-    # action references are not limited to jobs.<job>.steps.
-    if isinstance(obj, list):
-        for item in obj:
-            found.extend(find_uses(item))
-        return found
+        if not isinstance(node, dict):
+            continue
+
+        # Reusable workflows use jobs.<job>.uses. Actions use steps[*].uses.
+        # Search each mapping to support both forms.
+        if isinstance(node.get("uses"), str):
+            yield node, "uses"
+
+        stack.extend(reversed(list(node.values())))
 
-    # Process only dictionaries from this point.
-    if not isinstance(obj, dict):
-        return found
 
-    # Reusable workflows use jobs.<job>.uses. Actions use steps[*].uses.
-    # Search each mapping to support both forms.
-    if isinstance(obj.get("uses"), str):
-        found.append(obj["uses"])
+def _key_line(node: dict, key: str) -> int | None:
+    """Return the zero-based line of ``key`` in ``node``, or None.
+
+    Values that a YAML merge inherits have no source location in the mapping.
+    ``lc.key`` raises KeyError for them, so read ``lc.data`` instead.
+    """
+    data = getattr(getattr(node, "lc", None), "data", None)
+    if not data or key not in data:
+        return None
+    return data[key][0]
 
-    for value in obj.values():
-        found.extend(find_uses(value))
 
-    return found
+def find_uses(obj) -> list[str]:
+    """Find all 'uses' values in a YAML structure."""
+    return [node[key] for node, key in iter_uses(obj)]
 
 
 def get_granularity(version: str) -> Literal["major", "minor", "patch"]:
@@ -64,63 +84,307 @@ def update_uses_in_structure(obj, upgrades: dict[tuple[str, str], str]) -> bool:
     Update 'uses' values in a YAML structure.
     Return True when an update occurs.
     """
-    if not isinstance(obj, (dict, list)):
-        return False
-
     updated = False
+    for node, key in iter_uses(obj):
+        # Split only at the first "@". Keep references that contain a later "@"
+        # unchanged after the version or tag boundary.
+        use = node[key]
+        if "@" not in use:
+            continue
 
-    # Match find_uses behavior. Lists are containers. Mappings can be steps or
-    # reusable workflow jobs.
-    if isinstance(obj, list):
-        for item in obj:
-            if update_uses_in_structure(item, upgrades):
-                updated = True
-        return updated
-
-    # Split only at the first "@". Keep references that contain a later "@"
-    # unchanged after the version or tag boundary.
-    use = obj.get("uses")
-    if isinstance(use, str) and "@" in use:
         repo, tag = use.split("@", 1)
         new_tag = upgrades.get((repo, tag))
         if new_tag:
-            obj["uses"] = f"{repo}@{new_tag}"
-            updated = True
-
-    for value in obj.values():
-        if update_uses_in_structure(value, upgrades):
+            node[key] = f"{repo}@{new_tag}"
             updated = True
 
     return updated
 
 
+def find_uses_locations(obj) -> list[tuple[int | None, str]]:
+    """Find all 'uses' values with the zero-based line of their key."""
+    return [(_key_line(node, key), node[key]) for node, key in iter_uses(obj)]
+
+
 def find_uses_in_file(path: Path) -> tuple[list[str], str]:
     """Parse a YAML file and find all 'uses' entries."""
     text = path.read_text(encoding="utf-8")
-    yaml = YAML()
-    yaml.preserve_quotes = True
-    yaml.default_flow_style = False
-    yaml.map_indent = 2
-    yaml.sequence_indent = 4
-    yaml.sequence_dash_offset = 2
+    return [value for _, value in _locate_uses(path, text)], text
+
+
+def scan_uses_in_file(path: Path) -> list[tuple[int | None, str]]:
+    """Return the 'uses' locations of a YAML file without its text.
+
+    ``apply_updates`` accepts the located lines, so the rewrite phase does not
+    parse the file again. Try ``scan_uses_lexically`` first. Load the file
+    with ruamel only when the lexical scan cannot resolve it. The caller holds
+    only these records between the scan and the rewrite and reads the text
+    again for files that change.
+    """
+    return _locate_uses(path, path.read_text(encoding="utf-8"))
+
+
+def _locate_uses(path: Path, text: str) -> list[tuple[int | None, str]]:
+    lexical = scan_uses_lexically(text)
+    if lexical is not None:
+        return list(lexical)
 
     try:
-        docs = list(yaml.load_all(text))
+        return load_uses_locations(text)
     except Exception as exc:
         print(
             f"::warning file={path}::Failed to parse YAML: {exc}",
             file=sys.stderr,
         )
-        return [], text
+        return []
 
-    uses = []
-    for doc in docs:
+
+def load_uses_locations(text: str) -> list[tuple[int | None, str]]:
+    """Load every YAML document in ``text`` and find its 'uses' locations."""
+    yaml = YAML()
+    yaml.preserve_quotes = True
+    yaml.default_flow_style = False
+    yaml.map_indent = 2
+    yaml.sequence_indent = 4
+    yaml.sequence_dash_offset = 2
+
+    locations = []
+    for doc in yaml.load_all(text):
         if doc is None:
             continue
         # Workflow files rarely use multiple documents. load_all supports them
         # and other YAML files that match file-glob.
-        uses.extend(find_uses(doc))
-    return uses, text
+        locations.extend(find_uses_locations(doc))
+    return locations
+
+
+# Split a block-context line into "- " sequence markers and the node content.
+_LINE_RE = re.compile(r"(?P<dashes>(?:-(?: +|$))*)(?P<body>.*?)[ \t]*$")
+
+# A plain mapping key, then ":" and a space or the line end. Keys with ":" or
+# "#" do not match. The scanner then rejects the line as ambiguous.
+_KEY_RE = re.compile(
+    r"(?P<key>[^\s#'\"&*!|>{}\[\],?:%@`-][^:#]*?|-[^\s:#][^:#]*?) *:(?= |$)"
+)
+
+_BLOCK_HEADER_RE = re.compile(r"[|>][0-9+-]*(?: +#.*)?$")
+_DOCUMENT_START_RE = re.compile(r"---(?: +#.*)?$")
+
+# ruamel also breaks lines at these characters. Line numbers from a split on
+# "\n" do not match for such files.
+_EXTRA_LINE_BREAKS = ("\x85", "\u2028", "\u2029")
+
+
+class _Unresolved(Exception):
+    """The lexical scanner cannot resolve the file without a YAML parser."""
+
+
+def _quoted_end(text: str) -> int:
+    """Return the index after the quoted scalar that starts ``text``."""
+    quote = text[0]
+    index = 1
+    while index < len(text):
+        char = text[index]
+        if quote == '"' and char == "\\":
+            index += 2
+            continue
+
+        if char == quote:
+            if quote == "'" and text[index + 1 : index + 2] == "'":
+                index += 2
+                continue
+            return index + 1
+        index += 1
+
+    # A quoted scalar that continues on the next line.
+    raise _Unresolved
+
+
+def _flow_collection(value: str) -> str:
+    """Return a one-line flow collection such as ``[push, pull_request]``.
+
+    The scanner does not look inside flow collections. Reject collections that
+    continue on the next line or that can hold a ``uses`` key or an anchor.
+    """
+    depth = 0
+    index = 0
+    while index < len(value):
+        char = value[index]
+        if char in "'\"":
+            index += _quoted_end(value[index:])
+            continue
+
+        if char in "[{":
+            depth += 1
+        elif char in "]}":
+            depth -= 1
+            if depth == 0:
+                break
+        index += 1
+    else:
+        raise _Unresolved
+
+    collection, rest = value[: index + 1], value[index + 1 :].strip()
+    if rest and not rest.startswith("#"):
+        raise _Unresolved
+    if "uses" in collection or any(char in collection for char in "&*!"):
+        raise _Unresolved
+    return collection
+
+
+def _scalar_value(value: str) -> tuple[str, str | None]:
+    """Classify the value text after a key or sequence marker.
+
+    Return ``("nested", None)`` when a nested node follows on later lines,
+    ``("block", None)`` for a block scalar header, and ``("scalar", text)`` for
+    a one-line scalar or flow collection. ``text`` is the source text of the
+    node.
+    """
+    value = value.strip()
+    if not value or value.startswith("#"):
+        return "nested", None
+
+    # Anchors, aliases, and tags can add or share mappings.
+    if value[0] in "&*!":
+        raise _Unresolved
+
+    if value[0] in "{[":
+        return "scalar", _flow_collection(value)
+
+    if value[0] in "|>":
+        if not _BLOCK_HEADER_RE.match(value):
+            raise _Unresolved
+        return "block", None
+
+    if value[0] in "'\"":
+        end = _quoted_end(value)
+        rest = value[end:].strip()
+        if rest and not rest.startswith("#"):
+            raise _Unresolved
+        return "scalar", value[:end]
+
+    # A plain scalar ends at " #". Keep ": " out of the value, because the
+    # parser rejects it or reads a nested mapping.
+    comment = value.find(" #")
+    if comment != -1:
+        value = value[:comment].rstrip()
+    if re.search(r":(?: |$)", value) or value[0] in "?:,]}%@`":
+        raise _Unresolved
+    return "scalar", value
+
+
+def _uses_string(scalar: str) -> str:
+    """Return the string value of a ``uses`` scalar as ruamel loads it."""
+    if scalar[0] == "'":
+        return scalar[1:-1].replace("''", "'")
+
+    if scalar[0] == '"':
+        if "\\" in scalar:
+            raise _Unresolved
+        return scalar[1:-1]
+
+    # A plain scalar without "/" or "@" can resolve to a number, boolean, or
+    # null. Leave type resolution to the parser.
+    if ("/" not in scalar and "@" not in scalar) or scalar[0] in "-[{":
+        raise _Unresolved
+    return scalar
+
+
+def scan_uses_lexically(text: str) -> list[tuple[int, str]] | None:
+    """Find 'uses' locations line by line, without a YAML parser.
+
+    Return the same (line, value) pairs as ``load_uses_locations`` for block
+    style YAML. Return None when the file has a construct that needs the
+    parser: anchors, aliases, tags, multiline flow collections, multiline
+    quoted or plain scalars, or more than one document. Block scalar lines,
+    such as ``run: |`` scripts, are skipped. The scanner does not validate
+    YAML, so a malformed file can produce locations instead of a parser
+    warning.
+    """
+    if "uses" not in text:
+        return []
+
+    if any(char in text for char in _EXTRA_LINE_BREAKS) or text.count(
+        "\r"
+    ) != text.count("\r\n"):
+        return None
+
+    locations: list[tuple[int, str]] = []
+    block_parent: int | None = None
+    scalar_parent: int | None = None
+    seen_content = False
+    try:
+        for number, line in enumerate(text.split("\n")):
+            if number == 0:
+                line = line.lstrip("\ufeff")
+            line = line.rstrip("\r")
+            stripped = line.lstrip(" ")
+            indent = len(line) - len(stripped)
+
+            # Block scalar content continues while lines are blank or deeper
+            # than the key or sequence marker that started it.
+            if block_parent is not None:
+                if not stripped.strip() or indent > block_parent:
+                    continue
+                block_parent = None
+
+            if not stripped or stripped.startswith("#"):
+                continue
+
+            if stripped[0] == "\t":
+                raise _Unresolved
+
+            # A deeper line after a scalar continues that scalar.
+            if scalar_parent is not None and indent > scalar_parent:
+                raise _Unresolved
+            scalar_parent = None
+
+            if indent == 0 and stripped.startswith(("---", "...", "%")):
+                if seen_content or not _DOCUMENT_START_RE.match(stripped):
+                    raise _Unresolved
+                seen_content = True
+                continue
+            seen_content = True
+
+            match = _LINE_RE.match(stripped)
+            dashes, body = match.group("dashes"), match.group("body")
+            # The column of the innermost sequence marker, or of the node.
+            parent = indent + max(dashes.rstrip().rfind("-"), 0)
+
+            key_match = _KEY_RE.match(body)
+            if key_match is not None:
+                key = key_match.group("key").rstrip()
+                value = body[key_match.end() :]
+                parent = indent + len(dashes)
+            elif body[:1] in ("'", '"'):
+                end = _quoted_end(body)
+                rest = body[end:].lstrip()
+                if not rest.startswith(":"):
+                    value, key = body, None
+                elif rest[1:2] not in ("", " ") or body[1 : end - 1] == "uses":
+                    raise _Unresolved
+                else:
+                    value, key = rest[1:], None
+                    parent = indent + len(dashes)
+            elif re.search(r":(?: |$)", body):
+                raise _Unresolved
+            else:
+                value, key = body, None
+
+            kind, scalar = _scalar_value(value)
+            if key == "uses":
+                if kind != "scalar":
+                    raise _Unresolved
+                locations.append((number, _uses_string(scalar)))
+
+            if kind == "block":
+                block_parent = parent
+            elif kind == "scalar":
+                scalar_parent = parent
+    except _Unresolved:
+        return None
+
+    return locations
 
 
 def collect_workflow_files(root: Path, file_glob: str) -> list[Path]:
@@ -130,48 +394,60 @@ def collect_workflow_files(root: Path, file_glob: str) -> list[Path]:
 
 def find_uses_line_numbers(obj) -> set[int]:
     """Return zero-based source lines for YAML mapping keys named ``uses``."""
-    lines = set()
-    if isinstance(obj, list):
-        for item in obj:
-            lines.update(find_uses_line_numbers(item))
-        return lines
-
-    if not isinstance(obj, dict):
-        return lines
-
-    if isinstance(obj.get("uses"), str):
-        key_position = obj.lc.key("uses")
-        if key_position is not None:
-            lines.add(key_position[0])
+    lines = (_key_line(node, key) for node, key in iter_uses(obj))
+    return {line for line in lines if line is not None}
 
-    for value in obj.values():
-        lines.update(find_uses_line_numbers(value))
-    return lines
 
+def build_rewrite_index(upgrades: dict[tuple[str, str], str]) -> dict[str, str]:
+    """Map each current ``repo@tag`` value to its granularized new value.
 
-def apply_updates(text: str, upgrades: dict[tuple[str, str], str]) -> str:
+    Build the index once per run. ``apply_updates`` then needs one lookup per
+    line instead of a scan over all upgrades.
+    """
+    return {
+        f"{repo}@{current_tag}": f"{repo}@{granularize_tag(current_tag, new_tag)}"
+        for (repo, current_tag), new_tag in upgrades.items()
+    }
+
+
+def apply_updates(
+    text: str,
+    upgrades: dict[tuple[str, str], str],
+    uses_lines: set[int] | None = None,
+    rewrite_index: dict[str, str] | None = None,
+) -> str:
     """
     Apply targeted text replacements to a YAML workflow file.
     Preserve formatting and comments. Modify only 'uses:' lines.
+    ``uses_lines`` holds the zero-based key lines from ``scan_uses_in_file``.
+    Without it, parse ``text`` to find them. ``rewrite_index`` is the
+    ``build_rewrite_index`` result for ``upgrades``.
     """
+    if rewrite_index is None:
+        rewrite_index = build_rewrite_index(upgrades)
+
     # Do not write the parsed YAML. ruamel can change comments, indentation, and
     # multiline run blocks. Source locations allow a line-level rewrite without
     # changing scalar block content.
-    yaml = YAML()
-    try:
-        allowed_lines = set()
-        for doc in yaml.load_all(text):
-            if doc is not None:
-                allowed_lines.update(find_uses_line_numbers(doc))
-    except Exception:
-        return text
+    if uses_lines is not None:
+        allowed_lines = uses_lines
+    else:
+        yaml = YAML()
+        try:
+            allowed_lines = set()
+            for doc in yaml.load_all(text):
+                if doc is not None:
+                    allowed_lines.update(find_uses_line_numbers(doc))
+        except Exception:
+            return text
 
     lines = text.split("\n")
 
-    for i, line in enumerate(lines):
-        if i not in allowed_lines:
+    for i in sorted(allowed_lines):
+        if i >= len(lines):
             continue
 
+        line = lines[i]
         stripped = line.lstrip()
 
         # Skip lines without 'uses:'.
@@ -223,20 +499,16 @@ def apply_updates(text: str, upgrades: dict[tuple[str, str], str]) -> str:
 
         # Match the complete uses value. This prevents updates to strings that
         # contain an action reference only as a substring.
-        for (repo, current_tag), new_tag in upgrades.items():
-            old_value = f"{repo}@{current_tag}"
-            if value_part != old_value:
-                continue
+        new_value = rewrite_index.get(value_part)
+        if new_value is None:
+            continue
 
-            new_tag_granularized = granularize_tag(current_tag, new_tag)
-            new_value = f"{repo}@{new_tag_granularized}"
-            if quote:
-                new_value = f"{quote}{new_value}{quote}"
+        if quote:
+            new_value = f"{quote}{new_value}{quote}"
 
-            # Rebuild the line with the original format and comment.
-            prefix_str = "- " if stripped.startswith("- ") else ""
-            comment_str = f" {comment}" if comment else ""
-            lines[i] = f"{indent}{prefix_str}uses: {new_value}{comment_str}"
-            break
+        # Rebuild the line with the original format and comment.
+        prefix_str = "- " if stripped.startswith("- ") else ""
+        comment_str = f" {comment}" if comment else ""
+        lines[i] = f"{indent}{prefix_str}uses: {new_value}{comment_str}"
 
     return "\n".join(lines)
@@ -1,27 +1,475 @@
+import json
+import os
+import subprocess
+import tempfile
+import threading
 import unittest
+import urllib.error
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
 from unittest import mock
 
 from update_actions import github_api
+from update_actions.rate_limit import RequestScheduler
+from update_actions.release_cache import ReleaseCache
+from update_actions.scanner import granularize_tag
+from update_actions.versioning import VersionIndex
+
+
+# Stand-in GraphQL data by repository. Each list holds release pages in the
+# order that the API returns them.
+GRAPHQL_RELEASES = {
+    "actions/checkout": [
+        [("v5.0.0", False), ("v5.0.0-rc.1", True)],
+        [("v4.2.0", False)],
+    ],
+    "actions/cache": [[("v4.1.0", False), ("v4.0.0", True)]],
+}
+
+
+class GraphQLHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        length = int(self.headers["Content-Length"])
+        payload = json.loads(self.rfile.read(length))
+        self.server.requests.append(payload)
+        variables = payload["variables"]
+
+        data = {}
+        errors = []
+        index = 0
+        while f"owner{index}" in variables:
+            repo = f"{variables[f'owner{index}']}/{variables[f'name{index}']}"
+            pages = GRAPHQL_RELEASES.get(repo)
+            if pages is None:
+                data[f"r{index}"] = None
+                errors.append({"path": [f"r{index}"], "message": "Not Found"})
+            else:
+                page = int(variables[f"after{index}"] or 0)
+                data[f"r{index}"] = {
+                    "releases": {
+                        "nodes": [
+                            {"tagName": tag, "isPrerelease": prerelease}
+                            for tag, prerelease in pages[page]
+                        ],
+                        "pageInfo": {
+                            "hasNextPage": page + 1 < len(pages),
+                            "endCursor": str(page + 1),
+                        },
+                    }
+                }
+            index += 1
+
+        body = json.dumps({"data": data, "errors": errors}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestGraphQLReleaseTags(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), GraphQLHandler)
+        self.server.requests = []
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        url = f"http://127.0.0.1:{self.server.server_port}/graphql"
+        env = mock.patch.dict(
+            os.environ, {"GITHUB_GRAPHQL_URL": url, "GH_TOKEN": "token"}
+        )
+        env.start()
+        self.addCleanup(env.stop)
+
+    def test_batches_repositories_and_follows_cursors(self):
+        tags = github_api.fetch_release_tags_graphql(
+            ["actions/checkout", "actions/cache"]
+        )
+        self.assertEqual(
+            tags,
+            {"actions/checkout": ["v5.0.0", "v4.2.0"], "actions/cache": ["v4.1.0"]},
+        )
+        # The first request resolves both repositories. The second request
+        # continues only the repository with another page.
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(
+            self.server.requests[1]["variables"],
+            {"owner0": "actions", "name0": "checkout", "after0": "1"},
+        )
+
+    def test_splits_requests_by_batch_size(self):
+        github_api.fetch_release_tags_graphql(
+            ["actions/cache", "actions/checkout"], batch_size=1
+        )
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_missing_repository_returns_empty_list(self):
+        with mock.patch("sys.stderr") as stderr:
+            tags = github_api.fetch_release_tags_graphql(
+                ["actions/cache", "owner/missing"]
+            )
+        self.assertEqual(tags, {"actions/cache": ["v4.1.0"], "owner/missing": []})
+        warning = "".join(call.args[0] for call in stderr.write.call_args_list)
+        self.assertIn("Release lookup failed for owner/missing: Not Found", warning)
+
+    def test_unreachable_endpoint_returns_empty_lists(self):
+        self.server.shutdown()
+        self.server.server_close()
+        with mock.patch("sys.stderr"):
+            tags = github_api.fetch_release_tags_graphql(["actions/cache"])
+        self.assertEqual(tags, {"actions/cache": []})
 
 
 class TestGithubApi(unittest.TestCase):
-    def test_fetch_release_tags_filters_prerelease(self):
-        completed = mock.Mock()
-        completed.returncode = 0
-        completed.stdout = "v1\tfalse\nv2\ttrue\n1.2.3\tfalse\n"
-        completed.stderr = ""
-        with mock.patch("subprocess.run", return_value=completed) as run:
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), RestHandler)
+        self.server.requests = []
+        self.server.etag = '"v1"'
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        url = f"http://127.0.0.1:{self.server.server_port}"
+        env = mock.patch.dict(os.environ, {"GITHUB_API_URL": url, "GH_TOKEN": "t"})
+        env.start()
+        self.addCleanup(env.stop)
+
+    def test_fetch_release_tags_filters_prerelease_across_pages(self):
+        scheduler = RequestScheduler()
+        with github_api.use_scheduler(scheduler):
             tags = github_api.fetch_release_tags("actions/checkout")
-        run.assert_called_once()
-        self.assertEqual(tags, ["v1", "1.2.3"])
+
+        self.assertEqual(tags, ["v5.0.0", "v4.2.0"])
+        # Each page is one scheduled request with the token.
+        self.assertEqual(scheduler.requests, 2)
+        self.assertEqual(self.server.requests[0][1]["Authorization"], "Bearer t")
 
     def test_fetch_release_tags_handles_error(self):
-        completed = mock.Mock()
-        completed.returncode = 1
-        completed.stdout = ""
-        completed.stderr = "boom"
-        with mock.patch("subprocess.run", return_value=completed):
+        self.server.shutdown()
+        self.server.server_close()
+        with mock.patch("sys.stderr") as stderr:
             self.assertEqual(github_api.fetch_release_tags("actions/checkout"), [])
+        output = "".join(call.args[0] for call in stderr.write.call_args_list)
+        self.assertIn("::warning::Release lookup failed for actions/checkout", output)
+
+
+# Stand-in REST release pages for actions/checkout. The first page carries the
+# ETag. A request with the current ETag receives 304.
+REST_RELEASES = [
+    [
+        {"tag_name": "v5.0.0", "prerelease": False},
+        {"tag_name": "v5.0.0-rc.1", "prerelease": True},
+    ],
+    [{"tag_name": "v4.2.0", "prerelease": False}],
+]
+
+
+class RestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.requests.append((self.path, dict(self.headers)))
+        if self.headers.get("If-None-Match") == self.server.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        page = int(self.path.rsplit("page=", 1)[1]) if "&page=" in self.path else 0
+        body = json.dumps(REST_RELEASES[page]).encode("utf-8")
+        self.send_response(200)
+        if page == 0:
+            self.send_header("ETag", self.server.etag)
+            self.send_header("Last-Modified", "Mon, 05 Oct 2026 10:00:00 GMT")
+        if page + 1 < len(REST_RELEASES):
+            base = f"http://127.0.0.1:{self.server.server_port}"
+            self.send_header(
+                "Link",
+                f"<{base}/repos/actions/checkout/releases?per_page=100&page={page + 1}>; "
+                'rel="next"',
+            )
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestCachedReleaseTags(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), RestHandler)
+        self.server.requests = []
+        self.server.etag = '"v1"'
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        url = f"http://127.0.0.1:{self.server.server_port}"
+        env = mock.patch.dict(os.environ, {"GITHUB_API_URL": url, "GH_TOKEN": "t"})
+        env.start()
+        self.addCleanup(env.stop)
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.cache = ReleaseCache(Path(tmp.name))
+
+    def test_repeat_lookup_uses_conditional_request(self):
+        first = github_api.fetch_release_tags_cached("actions/checkout", self.cache)
+        self.assertEqual(first, ["v5.0.0", "v4.2.0"])
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(self.server.requests[0][1]["Authorization"], "Bearer t")
+
+        second = github_api.fetch_release_tags_cached("actions/checkout", self.cache)
+        self.assertEqual(second, first)
+        self.assertEqual(len(self.server.requests), 3)
+        _, headers = self.server.requests[2]
+        self.assertEqual(headers["If-None-Match"], '"v1"')
+        self.assertEqual(headers["If-Modified-Since"], "Mon, 05 Oct 2026 10:00:00 GMT")
+
+    def test_changed_listing_replaces_cache_entry(self):
+        github_api.fetch_release_tags_cached("actions/checkout", self.cache)
+        self.server.etag = '"v2"'
+        github_api.fetch_release_tags_cached("actions/checkout", self.cache)
+        self.assertEqual(len(self.server.requests), 4)
+        self.assertEqual(self.cache.get("actions/checkout").etag, '"v2"')
+
+    def test_failure_returns_empty_list(self):
+        self.server.shutdown()
+        self.server.server_close()
+        with mock.patch("sys.stderr"):
+            tags = github_api.fetch_release_tags_cached("actions/checkout", self.cache)
+        self.assertEqual(tags, [])
+        self.assertIsNone(self.cache.get("actions/checkout"))
+
+
+class StreamHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        if self.path.endswith("/releases/latest"):
+            if self.server.latest is None:
+                self._send(404, {"message": "Not Found"})
+            else:
+                self._send(200, {"tag_name": self.server.latest})
+            return
+
+        page = int(self.path.rsplit("page=", 1)[1]) if "&page=" in self.path else 0
+        link = None
+        if page + 1 < len(self.server.pages):
+            base = f"http://127.0.0.1:{self.server.server_port}"
+            link = f'<{base}/repos/o/r/releases?per_page=2&page={page + 1}>; rel="next"'
+        self._send(
+            200,
+            [
+                {"tag_name": tag, "prerelease": tag.endswith("-rc")}
+                for tag in self.server.pages[page]
+            ],
+            link,
+        )
+
+    def _send(self, status, payload, link=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        if link:
+            self.send_header("Link", link)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestStreamingReleaseTags(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StreamHandler)
+        self.server.requests = []
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        url = f"http://127.0.0.1:{self.server.server_port}"
+        env = mock.patch.dict(os.environ, {"GITHUB_API_URL": url})
+        env.start()
+        self.addCleanup(env.stop)
+
+        page_size = mock.patch.object(github_api, "RELEASES_PER_PAGE", 2)
+        page_size.start()
+        self.addCleanup(page_size.stop)
+
+    def test_stops_after_page_below_latest_release(self):
+        self.server.latest = "v5.0.0"
+        self.server.pages = [["v5.0.0", "v4.9.0"], ["v4.8.0", "v4.7.0"], ["v4.6.0"]]
+
+        tags = github_api.fetch_release_tags_streaming("o/r")
+
+        self.assertEqual(tags, ["v5.0.0", "v5.0.0", "v4.9.0"])
+        self.assertEqual(
+            self.server.requests,
+            ["/repos/o/r/releases/latest", "/repos/o/r/releases?per_page=2"],
+        )
+
+    def test_continues_while_pages_raise_the_maximum(self):
+        # A backport on the first page hides the newer release on the second
+        # page. The walk stops after the third page.
+        self.server.latest = None
+        self.server.pages = [
+            ["v3.9.1", "v5.0.0-rc"],
+            ["v5.0.0", "v4.0.0"],
+            ["v3.9.0", "v3.8.0"],
+            ["v3.7.0"],
+        ]
+
+        tags = github_api.fetch_release_tags_streaming("o/r")
+
+        self.assertEqual(tags, ["v3.9.1", "v5.0.0", "v4.0.0", "v3.9.0", "v3.8.0"])
+        self.assertEqual(len(self.server.requests), 4)
+
+    def test_failure_returns_empty_list(self):
+        self.server.shutdown()
+        self.server.server_close()
+        with mock.patch("sys.stderr"):
+            self.assertEqual(github_api.fetch_release_tags_streaming("o/r"), [])
+
+
+class LimitedHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        if self.server.limited > 0:
+            self.server.limited -= 1
+            status = 429
+            body = b'{"message": "secondary rate limit"}'
+        else:
+            status = 200
+            body = json.dumps([{"tag_name": "v1.0.0", "prerelease": False}]).encode()
+        self.send_response(status)
+        if status == 429:
+            self.send_header("Retry-After", "2")
+        self.send_header("X-RateLimit-Remaining", "4000")
+        self.send_header("X-RateLimit-Limit", "5000")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestRateLimitedRequests(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), LimitedHandler)
+        self.server.requests = []
+        self.server.limited = 0
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        url = f"http://127.0.0.1:{self.server.server_port}"
+        env = mock.patch.dict(os.environ, {"GITHUB_API_URL": url, "GH_TOKEN": "t"})
+        env.start()
+        self.addCleanup(env.stop)
+
+        self.sleeps = []
+        self.scheduler = RequestScheduler(max_retries=2, sleep=self.sleeps.append)
+        scheduler = github_api.use_scheduler(self.scheduler)
+        scheduler.__enter__()
+        self.addCleanup(scheduler.__exit__, None, None, None)
+
+    def test_retries_after_rate_limited_response(self):
+        self.server.limited = 1
+        with mock.patch("sys.stderr"):
+            tags = github_api.fetch_release_tags_streaming("o/r")
+        self.assertEqual(tags, ["v1.0.0"])
+        self.assertEqual(self.scheduler.retries, 1)
+        self.assertEqual(self.scheduler.remaining, 4000)
+        self.assertTrue(any(delay >= 1.0 for delay in self.sleeps))
+
+    def test_gives_up_after_max_retries(self):
+        self.server.limited = 10
+        url = github_api._api_url("/repos/o/r/releases")
+        with mock.patch("sys.stderr"):
+            with self.assertRaises(urllib.error.HTTPError) as raised:
+                github_api._rest_get(url, {})
+        self.assertEqual(raised.exception.code, 429)
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_rest_source_uses_rate_limit_headers(self):
+        self.server.limited = 1
+        with mock.patch("sys.stderr"):
+            tags = github_api.fetch_release_tags("o/r")
+        self.assertEqual(tags, ["v1.0.0"])
+        self.assertEqual(self.scheduler.retries, 1)
+        self.assertEqual(self.scheduler.requests, 2)
+        self.assertEqual(self.scheduler.remaining, 4000)
+        # Retry-After of the 429 response sets the pause.
+        self.assertAlmostEqual(max(self.sleeps), 2.0, places=1)
+
+
+class TestLsRemoteTags(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.server = Path(tmp.name)
+
+        env = mock.patch.dict(os.environ, {"GITHUB_SERVER_URL": self.server.as_uri()})
+        env.start()
+        self.addCleanup(env.stop)
+
+    def git(self, *args, cwd):
+        subprocess.run(
+            ["git", "-c", "user.name=test", "-c", "user.email=test@example.com"]
+            + list(args),
+            cwd=cwd,
+            check=True,
+            capture_output=True,
+        )
+
+    def make_repo(self, repo, tags):
+        work = self.server / "work" / repo
+        work.mkdir(parents=True)
+        self.git("init", "-q", cwd=work)
+        self.git("commit", "-q", "--allow-empty", "-m", "init", cwd=work)
+        for tag in tags:
+            # Annotated tags also list a peeled ``^{}`` ref without --refs.
+            self.git("tag", "-a", tag, "-m", tag, cwd=work)
+        self.git("branch", "-q", "-M", "main", cwd=work)
+        bare = self.server / f"{repo}.git"
+        bare.parent.mkdir(parents=True, exist_ok=True)
+        self.git("clone", "-q", "--bare", str(work), str(bare), cwd=self.server)
+
+    def test_lists_every_tag(self):
+        self.make_repo("actions/checkout", ["v4.2.0", "v5.0.0", "v5.0.0-rc.1"])
+
+        tags = github_api.fetch_release_tags_ls_remote("actions/checkout")
+
+        self.assertEqual(sorted(tags), ["v4.2.0", "v5.0.0", "v5.0.0-rc.1"])
+
+    def test_floating_tags_do_not_replace_patch_pins(self):
+        # ls-remote sorts by name, so each floating tag precedes its release.
+        self.make_repo("actions/checkout", ["v4", "v4.2.2", "v5", "v5.0.0"])
+
+        tags = github_api.fetch_release_tags_ls_remote("actions/checkout")
+        latest = VersionIndex(tags).latest()
+
+        self.assertEqual(tags, ["v4", "v4.2.2", "v5", "v5.0.0"])
+        self.assertEqual(latest, "v5.0.0")
+        self.assertEqual(granularize_tag("v4.2.2", latest), "v5.0.0")
+
+    def test_repository_without_tags(self):
+        self.make_repo("o/r", [])
+        self.assertEqual(github_api.fetch_release_tags_ls_remote("o/r"), [])
+
+    def test_missing_repository_returns_empty_list(self):
+        with mock.patch("sys.stderr") as stderr:
+            self.assertEqual(github_api.fetch_release_tags_ls_remote("o/missing"), [])
+        output = "".join(call.args[0] for call in stderr.write.call_args_list)
+        self.assertIn("::warning::Tag lookup failed for o/missing", output)
 
 
 if __name__ == "__main__":
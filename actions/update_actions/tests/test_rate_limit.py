@@ -0,0 +1,123 @@
+import unittest
+
+from update_actions.rate_limit import MAX_BACKOFF_SECONDS, RequestScheduler
+
+
+class FakeClock:
+    def __init__(self, start=1_000.0):
+        self.now = start
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def make_scheduler(clock, **kwargs):
+    return RequestScheduler(clock=clock, wall_clock=clock, sleep=clock.sleep, **kwargs)
+
+
+class TestRequestScheduler(unittest.TestCase):
+    def test_burst_then_paces_at_rate(self):
+        clock = FakeClock()
+        scheduler = make_scheduler(clock, rate=2.0, burst=3)
+        for _ in range(5):
+            scheduler.acquire()
+        self.assertEqual(clock.sleeps, [0.5, 0.5])
+        self.assertEqual(scheduler.requests, 5)
+        self.assertAlmostEqual(scheduler.waited, 1.0)
+
+    def test_observe_spreads_remaining_budget_until_reset(self):
+        clock = FakeClock()
+        scheduler = make_scheduler(clock, rate=10.0)
+        scheduler.observe(
+            {
+                "X-RateLimit-Remaining": "100",
+                "X-RateLimit-Limit": "5000",
+                "X-RateLimit-Reset": str(int(clock.now) + 200),
+            }
+        )
+        self.assertAlmostEqual(scheduler.rate, 0.5)
+
+        # A larger budget raises the rate in small steps.
+        scheduler.observe({"X-RateLimit-Remaining": "4000"})
+        self.assertAlmostEqual(scheduler.rate, 1.5)
+
+    def test_healthy_budget_keeps_base_rate(self):
+        clock = FakeClock()
+        scheduler = make_scheduler(clock, rate=10.0)
+        reset = str(int(clock.now) + 50 * 60)
+        scheduler.observe(
+            {
+                "X-RateLimit-Remaining": "4900",
+                "X-RateLimit-Limit": "5000",
+                "X-RateLimit-Reset": reset,
+            }
+        )
+        self.assertEqual(scheduler.rate, scheduler.base_rate)
+
+        # The GITHUB_TOKEN budget of 1,000 requests per hour.
+        scheduler.observe(
+            {
+                "X-RateLimit-Remaining": "950",
+                "X-RateLimit-Limit": "1000",
+                "X-RateLimit-Reset": reset,
+            }
+        )
+        self.assertEqual(scheduler.rate, scheduler.base_rate)
+
+    def test_exhausted_budget_pauses_until_reset(self):
+        clock = FakeClock()
+        scheduler = make_scheduler(clock)
+        scheduler.observe(
+            {
+                "X-RateLimit-Remaining": "0",
+                "X-RateLimit-Reset": str(int(clock.now) + 30),
+            }
+        )
+        scheduler.acquire()
+        self.assertEqual(clock.sleeps, [30.0])
+
+    def test_backoff_uses_retry_after(self):
+        clock = FakeClock()
+        scheduler = make_scheduler(clock, rate=4.0)
+        self.assertEqual(scheduler.backoff({"Retry-After": "7"}, 0), 7.0)
+        self.assertEqual(scheduler.rate, 2.0)
+        self.assertEqual(scheduler.retries, 1)
+        scheduler.acquire()
+        self.assertEqual(clock.sleeps, [7.0])
+
+    def test_backoff_without_headers_grows_and_stops(self):
+        clock = FakeClock()
+        scheduler = make_scheduler(clock, max_retries=3)
+        self.assertEqual(scheduler.backoff(None, 0), 60.0)
+        self.assertEqual(scheduler.backoff(None, 1), 120.0)
+        self.assertEqual(scheduler.backoff(None, 2), 240.0)
+        self.assertIsNone(scheduler.backoff(None, 3))
+        self.assertEqual(
+            scheduler.backoff({"Retry-After": "9999"}, 0), MAX_BACKOFF_SECONDS
+        )
+
+    def test_report(self):
+        clock = FakeClock(start=0.0)
+        scheduler = make_scheduler(clock)
+        scheduler.acquire()
+        scheduler.observe(
+            {
+                "X-RateLimit-Remaining": "4999",
+                "X-RateLimit-Limit": "5000",
+                "X-RateLimit-Reset": "3600",
+            }
+        )
+        self.assertEqual(
+            scheduler.report(),
+            "GitHub API budget: 1 requests, 0 rate-limited retries, 0.0 s paced. "
+            "Remaining: 4999 of 5000, resets at 01:00:00 UTC.",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from update_actions.release_cache import CachedReleases, ReleaseCache
+
+
+class TestReleaseCache(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = Path(tmp.name)
+
+    def test_round_trip(self):
+        cache = ReleaseCache(self.directory)
+        releases = CachedReleases(tags=["v1", "v2"], etag='"abc"', last_modified=None)
+        cache.put("actions/checkout", releases)
+        self.assertEqual(cache.get("actions/checkout"), releases)
+        self.assertEqual(cache.get("Actions/Checkout"), releases)
+        self.assertIsNone(cache.get("actions/cache"))
+
+    def test_expired_entry_is_evicted(self):
+        cache = ReleaseCache(self.directory, ttl=60)
+        cache.put("actions/checkout", CachedReleases(["v1"], None, None))
+        with mock.patch("time.time", return_value=time.time() + 120):
+            self.assertIsNone(cache.get("actions/checkout"))
+        self.assertEqual(list(self.directory.glob("*.json")), [])
+
+    def test_prune_removes_least_recently_used_entries(self):
+        cache = ReleaseCache(self.directory)
+        for index, repo in enumerate(["a/a", "b/b", "c/c"]):
+            cache.put(repo, CachedReleases([f"v{index}"], None, None))
+            os.utime(cache._path(repo), (1000 + index, 1000 + index))
+        # Use a/a so that b/b becomes the least recently used entry.
+        cache.get("a/a")
+
+        cache.max_bytes = sum(
+            cache._path(repo).stat().st_size for repo in ("a/a", "c/c")
+        )
+        cache.prune()
+
+        self.assertIsNotNone(cache.get("a/a"))
+        self.assertIsNone(cache.get("b/b"))
+        self.assertIsNotNone(cache.get("c/c"))
+
+    def test_prune_removes_corrupt_entries(self):
+        cache = ReleaseCache(self.directory)
+        (self.directory / "broken.json").write_text("{", encoding="utf-8")
+        cache.prune()
+        self.assertFalse((self.directory / "broken.json").exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
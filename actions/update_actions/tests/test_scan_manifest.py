@@ -0,0 +1,42 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from update_actions.scan_manifest import MANIFEST_VERSION, ScanManifest
+
+
+class TestScanManifest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name)
+        self.manifest_path = self.root / "scan-manifest.json"
+
+    def test_round_trip_by_digest(self):
+        workflow = self.root / "ci.yml"
+        workflow.write_text("name: ci\n", encoding="utf-8")
+        manifest = ScanManifest(self.manifest_path)
+        manifest.put(workflow, "abc", [(3, "a/b@v1"), (None, "a/c@v1")])
+        manifest.save()
+
+        loaded = ScanManifest(self.manifest_path)
+        self.assertEqual(loaded.get(workflow, "abc"), [(3, "a/b@v1"), (None, "a/c@v1")])
+        self.assertIsNone(loaded.get(workflow, "def"))
+
+    def test_ignores_other_versions(self):
+        self.manifest_path.write_text(
+            json.dumps({"version": MANIFEST_VERSION + 1, "files": {"x": {}}}),
+            encoding="utf-8",
+        )
+        self.assertEqual(ScanManifest(self.manifest_path).files, {})
+
+    def test_save_drops_deleted_files(self):
+        manifest = ScanManifest(self.manifest_path)
+        manifest.put(self.root / "deleted.yml", "abc", [])
+        manifest.save()
+        self.assertEqual(ScanManifest(self.manifest_path).files, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
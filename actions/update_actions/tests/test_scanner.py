@@ -1,9 +1,67 @@
+import random
 import tempfile
 import unittest
 from pathlib import Path
+from unittest import mock
+
+from ruamel.yaml import YAML
 
 from update_actions import scanner
 
+REPO_ROOT = Path(__file__).parents[3]
+
+# Step fragments for the differential tests. Each fragment is valid in a
+# steps list at a six-space indentation.
+STEP_FRAGMENTS = [
+    "      - uses: actions/checkout@v4",
+    "      - name: Setup\n        uses: 'actions/setup-node@v4' # pinned",
+    '      - uses: "owner/repo/path/to/action@v1"',
+    "      - uses: docker://alpine:3.20",
+    "      - uses: ./.github/actions/local",
+    "      - uses : actions/cache@v4",
+    "      # - uses: commented/out@v1",
+    '      - run: |\n          echo "uses: actions/checkout@v3"\n'
+    "          uses: fake/action@v1\n\n          done",
+    "      - run: >-\n          uses: folded/text@v1",
+    "      - with:\n          node: [18, 20]\n        uses: actions/setup-node@v3",
+    '      - name: "quoted: value"\n        uses: a/b@v2',
+    "      - name: 'it''s'\n        uses: a/b@v3",
+    "      - env: {A: 1}\n        uses: a/c@v1",
+    "      - name: &step-name anchored\n        uses: a/b@v1",
+    "      - {uses: flow/mapping@v1}",
+    "      - name: multi\n          line\n        uses: a/b@v1",
+    "      - uses: 123",
+    "      - uses:\n          actions/next-line@v1",
+    '      - uses: "escaped\\u0040v1/x"',
+    "      - reuses: not/uses@v1\n        uses: actual/uses@v1",
+    "      - - uses: nested/sequence@v1",
+]
+
+HEADER_FRAGMENTS = [
+    "name: CI\non: [push, pull_request]\n",
+    "---\nname: CI\non:\n  push:\n    branches: [main]\n",
+    "name: CI\non: {push: {branches: [main]}}\n",
+    "# comment\nname: CI\n",
+]
+
+JOB_FRAGMENTS = [
+    "  reusable:\n    uses: owner/repo/.github/workflows/ci.yml@v1\n",
+    "  plain:\n    runs-on: ubuntu-latest\n",
+    "  matrix:\n    strategy:\n      matrix:\n        include:\n"
+    "          - uses: matrix/value@v1\n",
+]
+
+# A step that inherits ``uses`` through a YAML merge and has its own ``name``.
+MERGE_WORKFLOW = (
+    "x-checkout: &checkout\n"
+    "  uses: actions/checkout@v4\n"
+    "jobs:\n"
+    "  build:\n"
+    "    steps:\n"
+    "      - <<: *checkout\n"
+    "        name: Checkout\n"
+)
+
 
 class TestScanner(unittest.TestCase):
     def test_get_granularity(self):
@@ -60,6 +118,64 @@ class TestScanner(unittest.TestCase):
             ],
         )
 
+    def test_find_uses_handles_deep_nesting(self):
+        data = {"uses": "a/b@v1"}
+        for _ in range(5000):
+            data = {"matrix": [data]}
+        self.assertEqual(scanner.find_uses(data), ["a/b@v1"])
+
+    def test_iter_uses_yields_parent_before_children(self):
+        data = [
+            {"uses": "a/a@v1", "with": {"nested": [{"uses": "a/b@v1"}]}},
+            {"uses": 5},
+            {"uses": "a/c@v1"},
+        ]
+        self.assertEqual(
+            [node[key] for node, key in scanner.iter_uses(data)],
+            ["a/a@v1", "a/b@v1", "a/c@v1"],
+        )
+
+    def test_merge_inherited_uses_in_every_walker(self):
+        yaml = YAML()
+        data = yaml.load(MERGE_WORKFLOW)
+        inherited = data["jobs"]["build"]["steps"][0]
+
+        self.assertEqual(
+            scanner.find_uses(data), ["actions/checkout@v4", "actions/checkout@v4"]
+        )
+        self.assertEqual(
+            scanner.find_uses_locations(data),
+            [(1, "actions/checkout@v4"), (None, "actions/checkout@v4")],
+        )
+        self.assertEqual(scanner.find_uses_line_numbers(data), {1})
+        self.assertTrue(
+            scanner.update_uses_in_structure(data, {("actions/checkout", "v4"): "v5"})
+        )
+        self.assertEqual(data["x-checkout"]["uses"], "actions/checkout@v5")
+        self.assertEqual(inherited["uses"], "actions/checkout@v5")
+
+    def test_update_uses_in_structure(self):
+        data = {
+            "jobs": {
+                "build": {
+                    "steps": [
+                        {"uses": "actions/checkout@v3"},
+                        {"uses": "./local"},
+                        {"uses": "actions/cache@v3"},
+                    ]
+                }
+            }
+        }
+        updated = scanner.update_uses_in_structure(
+            data, {("actions/checkout", "v3"): "v4"}
+        )
+        self.assertTrue(updated)
+        self.assertEqual(
+            scanner.find_uses(data),
+            ["actions/checkout@v4", "./local", "actions/cache@v3"],
+        )
+        self.assertFalse(scanner.update_uses_in_structure(data, {}))
+
     def test_find_uses_in_file_invalid_yaml(self):
         with tempfile.TemporaryDirectory() as tmpdir:
             path = Path(tmpdir) / "bad.yml"
@@ -68,6 +184,164 @@ class TestScanner(unittest.TestCase):
             self.assertEqual(uses, [])
             self.assertEqual(text, ":::not yaml")
 
+    def test_scan_uses_in_file_resolves_anchors_with_parser(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "ci.yml"
+            path.write_text(
+                "jobs:\n  build:\n    steps:\n      - uses: &a actions/checkout@v4\n",
+                encoding="utf-8",
+            )
+            locations = scanner.scan_uses_in_file(path)
+            self.assertEqual(locations, [(3, "actions/checkout@v4")])
+
+    def test_scan_uses_in_file_keeps_merge_inherited_uses(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "ci.yml"
+            path.write_text(MERGE_WORKFLOW, encoding="utf-8")
+            with mock.patch("sys.stderr") as stderr:
+                locations = scanner.scan_uses_in_file(path)
+
+        stderr.write.assert_not_called()
+        self.assertEqual(
+            locations, [(1, "actions/checkout@v4"), (None, "actions/checkout@v4")]
+        )
+
+    def test_scan_uses_in_file_records_key_lines(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "ci.yml"
+            path.write_text(
+                "jobs:\n"
+                "  build:\n"
+                "    steps:\n"
+                "      - uses: actions/checkout@v4\n"
+                "      - run: echo hi\n"
+                "  reusable:\n"
+                "    uses: 'owner/repo/.github/workflows/ci.yml@v1'\n",
+                encoding="utf-8",
+            )
+            locations = scanner.scan_uses_in_file(path)
+        self.assertEqual(
+            locations,
+            [
+                (3, "actions/checkout@v4"),
+                (6, "owner/repo/.github/workflows/ci.yml@v1"),
+            ],
+        )
+
+    def test_apply_updates_with_uses_lines_does_not_parse(self):
+        text = "steps:\n  - uses: actions/checkout@v3\n"
+        with mock.patch("update_actions.scanner.YAML") as yaml:
+            updated = scanner.apply_updates(
+                text, {("actions/checkout", "v3"): "v4"}, uses_lines={1}
+            )
+        yaml.assert_not_called()
+        self.assertEqual(updated, "steps:\n  - uses: actions/checkout@v4\n")
+
+    def assertMatchesParser(self, text):
+        lexical = scanner.scan_uses_lexically(text)
+        if lexical is not None:
+            self.assertEqual(lexical, scanner.load_uses_locations(text))
+        return lexical
+
+    def test_scan_uses_lexically_matches_parser_for_fragments(self):
+        for header in HEADER_FRAGMENTS:
+            for job in JOB_FRAGMENTS:
+                for step in STEP_FRAGMENTS:
+                    text = f"{header}jobs:\n{job}  build:\n    steps:\n{step}\n"
+                    with self.subTest(text=text):
+                        self.assertMatchesParser(text)
+
+    def test_scan_uses_lexically_matches_parser_for_random_workflows(self):
+        rng = random.Random(1234)
+        for _ in range(300):
+            steps = rng.choices(STEP_FRAGMENTS, k=rng.randint(1, 8))
+            text = (
+                rng.choice(HEADER_FRAGMENTS)
+                + "jobs:\n"
+                + "".join(rng.sample(JOB_FRAGMENTS, k=2))
+                + "  build:\n    steps:\n"
+                + "\n".join(steps)
+                + "\n"
+            )
+            if rng.random() < 0.2:
+                text = text.replace("\n", "\r\n")
+            with self.subTest(text=text):
+                self.assertMatchesParser(text)
+
+    def test_scan_uses_lexically_matches_parser_for_repository_files(self):
+        paths = sorted(REPO_ROOT.glob(".github/workflows/*.yml"))
+        paths += sorted(REPO_ROOT.glob("*/action.yml"))
+        self.assertTrue(paths)
+        for path in paths:
+            with self.subTest(path=path.relative_to(REPO_ROOT)):
+                self.assertMatchesParser(path.read_text(encoding="utf-8"))
+
+    def test_scan_uses_lexically_resolves_block_style_workflows(self):
+        text = (
+            "---\n"
+            "on: [push]\n"
+            "jobs:\n"
+            "  build:\n"
+            "    steps:\n"
+            "      - run: |\n"
+            "          uses: fake/action@v1\n"
+            "      - uses: 'actions/checkout@v4' # pinned\n"
+        )
+        self.assertEqual(
+            scanner.scan_uses_lexically(text), [(7, "actions/checkout@v4")]
+        )
+        self.assertEqual(scanner.scan_uses_lexically("name: no actions\n"), [])
+
+    def test_scan_uses_lexically_defers_unresolved_constructs(self):
+        cases = {
+            "anchor": "a: &x\n  uses: a/b@v1\nb: *x\n",
+            "flow mapping": "steps:\n  - {uses: a/b@v1}\n",
+            "multiple documents": "uses: a/b@v1\n---\nuses: a/c@v1\n",
+            "multiline quoted": 'run: "echo\n  uses: a/b@v1"\n',
+            "multiline plain": "uses: a/b@v1\n  continued\n",
+            "non-string value": "uses: 1.5\n",
+            "quoted key": '"uses": a/b@v1\n',
+        }
+        for name, text in cases.items():
+            with self.subTest(case=name):
+                self.assertIsNone(scanner.scan_uses_lexically(text))
+
+    def test_scan_uses_in_file_skips_parser_for_block_style_files(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "ci.yml"
+            path.write_text("steps:\n  - uses: a/b@v1\n", encoding="utf-8")
+            with mock.patch("update_actions.scanner.YAML") as yaml:
+                locations = scanner.scan_uses_in_file(path)
+        yaml.assert_not_called()
+        self.assertEqual(locations, [(1, "a/b@v1")])
+
+    def test_build_rewrite_index(self):
+        index = scanner.build_rewrite_index(
+            {
+                ("actions/checkout", "v3"): "v4.1.0",
+                ("actions/cache", "v3.1"): "v4.2.0",
+            }
+        )
+        self.assertEqual(
+            index,
+            {
+                "actions/checkout@v3": "actions/checkout@v4",
+                "actions/cache@v3.1": "actions/cache@v4.2",
+            },
+        )
+
+    def test_apply_updates_granularizes_once_per_upgrade(self):
+        text = "steps:\n" + "  - uses: actions/checkout@v3\n" * 5
+        with mock.patch(
+            "update_actions.scanner.granularize_tag",
+            side_effect=scanner.granularize_tag,
+        ) as granularize_tag:
+            updated = scanner.apply_updates(
+                text, {("actions/checkout", "v3"): "v4.1.0"}, set(range(1, 6))
+            )
+        granularize_tag.assert_called_once_with("v3", "v4.1.0")
+        self.assertEqual(updated.count("actions/checkout@v4\n"), 5)
+
     def test_apply_updates(self):
         text = """
         steps:
@@ -5,6 +5,7 @@ from pathlib import Path
 from unittest import mock
 
 from update_actions import updater
+from update_actions.scan_manifest import ScanManifest
 
 
 ACTION = Path(__file__).parents[2] / "action.yml"
@@ -301,6 +302,356 @@ jobs:
                 workflow.read_text(encoding="utf-8"),
             )
 
+    def test_update_actions_concurrent_lookups_are_deterministic(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            workflow_dir = root / ".github/workflows"
+            workflow_dir.mkdir(parents=True)
+            workflow = workflow_dir / "ci.yml"
+            repos = [f"owner/action-{index:02d}" for index in range(12)]
+            workflow.write_text(
+                "jobs:\n  build:\n    steps:\n"
+                + "".join(f"      - uses: {repo}@v1\n" for repo in reversed(repos)),
+                encoding="utf-8",
+            )
+            output_file = root / "github_output"
+
+            with mock.patch(
+                "update_actions.updater.fetch_release_tags",
+                return_value=["v2"],
+            ) as fetch_release_tags:
+                with mock.patch.dict(os.environ, {"GITHUB_OUTPUT": str(output_file)}):
+                    updater.update_actions(
+                        root=root,
+                        file_glob=".github/**/*.yml",
+                        excluded_actions=[],
+                        dry_run=False,
+                        max_concurrency=4,
+                    )
+
+            self.assertEqual(
+                sorted(call.args[0] for call in fetch_release_tags.call_args_list),
+                repos,
+            )
+            output = output_file.read_text(encoding="utf-8")
+            self.assertEqual(
+                output,
+                "action_updates<<ENDOFUPDATES\n"
+                + "".join(f"{repo}\tv1\tv2\n" for repo in repos)
+                + "ENDOFUPDATES\n",
+            )
+
+    def test_fetch_all_release_tags_keeps_repository_order(self):
+        def fetch_release_tags(repo):
+            return [f"{repo}-tag"]
+
+        repos = ["b/b", "a/a", "c/c"]
+        with mock.patch(
+            "update_actions.updater.fetch_release_tags",
+            side_effect=fetch_release_tags,
+        ):
+            tags = updater.fetch_all_release_tags(repos, max_concurrency=3)
+
+        self.assertEqual(list(tags), repos)
+        self.assertEqual(tags["a/a"], ["a/a-tag"])
+
+    def test_fetch_all_release_tags_graphql_source(self):
+        with mock.patch(
+            "update_actions.updater.fetch_release_tags_graphql",
+            return_value={"a/a": ["v1"], "b/b": []},
+        ) as fetch_graphql:
+            with mock.patch("update_actions.updater.fetch_release_tags") as fetch_rest:
+                tags = updater.fetch_all_release_tags(
+                    ["a/a", "b/b"], release_source="graphql"
+                )
+
+        fetch_graphql.assert_called_once_with(["a/a", "b/b"])
+        fetch_rest.assert_not_called()
+        self.assertEqual(tags, {"a/a": ["v1"], "b/b": []})
+
+    def test_fetch_all_release_tags_git_source(self):
+        with mock.patch(
+            "update_actions.updater.fetch_release_tags_ls_remote",
+            side_effect=lambda repo: [f"{repo}-tag"],
+        ) as fetch_git:
+            with mock.patch("update_actions.updater.fetch_release_tags") as fetch_rest:
+                tags = updater.fetch_all_release_tags(
+                    ["a/a", "b/b"], release_source="git", cache_dir=Path("unused")
+                )
+
+        self.assertEqual(fetch_git.call_count, 2)
+        fetch_rest.assert_not_called()
+        self.assertEqual(tags, {"a/a": ["a/a-tag"], "b/b": ["b/b-tag"]})
+
+    def test_update_actions_skips_files_without_upgraded_values(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            workflow_dir = root / ".github/workflows"
+            workflow_dir.mkdir(parents=True)
+            (workflow_dir / "a.yml").write_text(
+                "jobs:\n  build:\n    steps:\n      - uses: actions/checkout@v3\n",
+                encoding="utf-8",
+            )
+            (workflow_dir / "b.yml").write_text(
+                "jobs:\n  build:\n    steps:\n      - uses: actions/checkout@v4\n",
+                encoding="utf-8",
+            )
+
+            with mock.patch(
+                "update_actions.updater.fetch_release_tags",
+                return_value=["v4"],
+            ):
+                with mock.patch(
+                    "update_actions.updater.apply_updates",
+                    side_effect=updater.apply_updates,
+                ) as apply_updates:
+                    updater.update_actions(
+                        root=root,
+                        file_glob=".github/**/*.yml",
+                        excluded_actions=[],
+                        dry_run=False,
+                    )
+
+            apply_updates.assert_called_once()
+            self.assertEqual(apply_updates.call_args.args[2], {3})
+            self.assertIn(
+                "actions/checkout@v4",
+                (workflow_dir / "a.yml").read_text(encoding="utf-8"),
+            )
+
+    def test_update_actions_reads_text_only_for_changed_files(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            workflow_dir = root / ".github/workflows"
+            workflow_dir.mkdir(parents=True)
+            for name, tag in [("a.yml", "v3"), ("b.yml", "v4"), ("c.yml", "v3")]:
+                (workflow_dir / name).write_text(
+                    f"jobs:\n  build:\n    steps:\n"
+                    f"      - uses: actions/checkout@{tag}\n",
+                    encoding="utf-8",
+                )
+
+            read_text = Path.read_text
+            with mock.patch(
+                "update_actions.updater.fetch_release_tags", return_value=["v4.0.0"]
+            ):
+                with mock.patch.object(
+                    Path, "read_text", autospec=True, side_effect=read_text
+                ) as spy:
+                    updater.update_actions(
+                        root=root,
+                        file_glob=".github/**/*.yml",
+                        excluded_actions=[],
+                        dry_run=False,
+                    )
+
+            # One read per file for the scan, then one per rewritten file.
+            reads = [call.args[0].name for call in spy.call_args_list]
+            self.assertEqual(
+                sorted(reads), ["a.yml", "a.yml", "b.yml", "c.yml", "c.yml"]
+            )
+
+    def test_scan_workflow_files_parallel_matches_serial(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            paths = []
+            for index in range(6):
+                path = root / f"ci-{index}.yml"
+                path.write_text(
+                    f"jobs:\n  build:\n    steps:\n      - uses: a/b@v{index}\n",
+                    encoding="utf-8",
+                )
+                paths.append(path)
+
+            serial = updater.scan_workflow_files(paths, jobs=1)
+            parallel = updater.scan_workflow_files(paths, jobs=2)
+
+        self.assertEqual(parallel, serial)
+        self.assertEqual(serial[5], [(3, "a/b@v5")])
+
+    def test_scan_workflow_files_uses_threshold_by_default(self):
+        paths = [Path("a.yml"), Path("b.yml")]
+        with mock.patch(
+            "update_actions.updater.scan_uses_in_file", return_value=[]
+        ) as scan_uses_in_file:
+            with mock.patch("update_actions.updater.ProcessPoolExecutor") as pool:
+                updater.scan_workflow_files(paths)
+
+        pool.assert_not_called()
+        self.assertEqual(scan_uses_in_file.call_count, 2)
+
+    def test_scan_workflow_files_reuses_manifest_for_unchanged_files(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            first = root / "a.yml"
+            second = root / "b.yml"
+            first.write_text("steps:\n  - uses: a/a@v1\n", encoding="utf-8")
+            second.write_text("steps:\r\n  - uses: b/b@v1\r\n", encoding="utf-8")
+            paths = [first, second]
+            full = updater.scan_workflow_files(paths)
+
+            manifest_path = root / "cache" / "scan-manifest.json"
+            cold = updater.scan_workflow_files(paths, 1, ScanManifest(manifest_path))
+            self.assertTrue(manifest_path.is_file())
+
+            first.write_text("steps:\n  - uses: a/a@v2\n", encoding="utf-8")
+            with mock.patch(
+                "update_actions.updater.scan_uses_in_file",
+                side_effect=updater.scan_uses_in_file,
+            ) as scan_uses_in_file:
+                warm = updater.scan_workflow_files(
+                    paths, 1, ScanManifest(manifest_path)
+                )
+
+            scan_uses_in_file.assert_called_once_with(first)
+            self.assertEqual(cold, full)
+            self.assertEqual(warm[0], [(1, "a/a@v2")])
+            self.assertEqual(warm[1], full[1])
+
+    def test_update_actions_full_rescan_parses_every_file(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            workflow_dir = root / ".github/workflows"
+            workflow_dir.mkdir(parents=True)
+            workflow = workflow_dir / "ci.yml"
+            workflow.write_text(
+                "jobs:\n  build:\n    steps:\n      - uses: actions/checkout@v3\n",
+                encoding="utf-8",
+            )
+            cache_dir = root / "cache"
+
+            def run(full_rescan):
+                with mock.patch(
+                    "update_actions.updater.scan_uses_in_file",
+                    side_effect=updater.scan_uses_in_file,
+                ) as scan_uses_in_file:
+                    updater.update_actions(
+                        root=root,
+                        file_glob=".github/**/*.yml",
+                        excluded_actions=[],
+                        dry_run=True,
+                        release_source="stream",
+                        cache_dir=cache_dir,
+                        full_rescan=full_rescan,
+                    )
+                return scan_uses_in_file.call_count
+
+            with mock.patch(
+                "update_actions.updater.fetch_release_tags_streaming",
+                return_value=[],
+            ):
+                self.assertEqual(run(full_rescan=False), 1)
+                self.assertEqual(run(full_rescan=False), 0)
+                self.assertEqual(run(full_rescan=True), 1)
+
+
+class TestUpdateActionsBatch(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.base = Path(tmp.name)
+
+    def make_root(self, name, uses):
+        root = self.base / name
+        workflow_dir = root / ".github/workflows"
+        workflow_dir.mkdir(parents=True)
+        steps = "".join(f"      - uses: {value}\n" for value in uses)
+        (workflow_dir / "ci.yml").write_text(
+            f"jobs:\n  build:\n    steps:\n{steps}", encoding="utf-8"
+        )
+        return root
+
+    def test_resolves_each_release_repo_once(self):
+        first = self.make_root(
+            "first", ["actions/checkout@v3", "actions/setup-node@v3"]
+        )
+        second = self.make_root("second", ["actions/checkout@v3.0"])
+        current = self.make_root("current", ["actions/checkout@v4"])
+        empty = self.base / "empty"
+        empty.mkdir()
+        records = self.base / "records"
+        releases = {
+            "actions/checkout": ["v4.1.0", "v3.0.0"],
+            "actions/setup-node": ["v4.0.0"],
+        }
+
+        with mock.patch(
+            "update_actions.updater.fetch_release_tags", side_effect=releases.get
+        ) as fetch_release_tags:
+            result = updater.update_actions_batch(
+                roots=[first, second, current, empty],
+                file_glob=".github/**/*.yml",
+                excluded_actions=[],
+                dry_run=False,
+                records_dir=records,
+            )
+
+        self.assertEqual(result, 0)
+        self.assertEqual(
+            sorted(call.args[0] for call in fetch_release_tags.call_args_list),
+            ["actions/checkout", "actions/setup-node"],
+        )
+        self.assertIn(
+            "actions/checkout@v4\n",
+            (first / ".github/workflows/ci.yml").read_text(encoding="utf-8"),
+        )
+        self.assertIn(
+            "actions/checkout@v4.1\n",
+            (second / ".github/workflows/ci.yml").read_text(encoding="utf-8"),
+        )
+        self.assertEqual(
+            (records / "first.txt").read_text(encoding="utf-8"),
+            "action_updates<<ENDOFUPDATES\n"
+            "actions/checkout\tv3\tv4\n"
+            "actions/setup-node\tv3\tv4\n"
+            "ENDOFUPDATES\n",
+        )
+        self.assertEqual(
+            (records / "second.txt").read_text(encoding="utf-8"),
+            "action_updates<<ENDOFUPDATES\n"
+            "actions/checkout\tv3.0\tv4.1\n"
+            "ENDOFUPDATES\n",
+        )
+        self.assertEqual((records / "current.txt").read_text(encoding="utf-8"), "")
+        self.assertEqual((records / "empty.txt").read_text(encoding="utf-8"), "")
+
+    def test_repeated_root_names_get_numbered_records(self):
+        first = self.make_root("a/repo", ["actions/checkout@v3"])
+        second = self.make_root("b/repo", ["actions/checkout@v3"])
+        # Named like the numbered record of ``second``.
+        third = self.make_root("c/repo-2", ["actions/setup-node@v3"])
+        records = self.base / "records"
+
+        with mock.patch(
+            "update_actions.updater.fetch_release_tags", return_value=["v4.0.0"]
+        ):
+            updater.update_actions_batch(
+                roots=[first, second, third],
+                file_glob=".github/**/*.yml",
+                excluded_actions=[],
+                dry_run=True,
+                records_dir=records,
+            )
+
+        self.assertEqual(
+            sorted(path.name for path in records.iterdir()),
+            ["repo-2-2.txt", "repo-2.txt", "repo.txt"],
+        )
+        self.assertIn(
+            "actions/checkout",
+            (records / "repo-2.txt").read_text(encoding="utf-8"),
+        )
+        self.assertIn(
+            "actions/setup-node",
+            (records / "repo-2-2.txt").read_text(encoding="utf-8"),
+        )
+        self.assertEqual(
+            updater._record_names(
+                [Path("/a/x"), Path("/b/x"), Path("/c/x-2"), Path("/d/x")]
+            ),
+            ["x.txt", "x-2.txt", "x-2-2.txt", "x-3.txt"],
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -18,6 +18,38 @@ class TestVersioning(unittest.TestCase):
         tags = ["v1", "v2", "1.2.3", "not-a-tag"]
         self.assertEqual(versioning.select_latest_tag(tags), "v2")
 
+    def test_select_latest_tag_prefers_most_specific_tag(self):
+        self.assertEqual(versioning.select_latest_tag(["v4", "v4.0.0"]), "v4.0.0")
+        self.assertEqual(versioning.select_latest_tag(["v4.0.0", "v4"]), "v4.0.0")
+        self.assertEqual(versioning.select_latest_tag(["v4.0", "4.0"]), "v4.0")
+        self.assertIsNone(versioning.select_latest_tag(["latest"]))
+
+    def test_version_key(self):
+        self.assertEqual(versioning.version_key("v1.2"), (1, 2, 0))
+        self.assertIsNone(versioning.version_key("1.2.3-beta"))
+
+
+class TestVersionIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = versioning.VersionIndex(
+            ["v3.1.0", "v2", "v2.0.0", "v3", "nightly", "v10.0.1", "v3.0.5"]
+        )
+
+    def test_sorts_and_drops_invalid_tags(self):
+        self.assertEqual(len(self.index), 5)
+        self.assertEqual(self.index.latest(), "v10.0.1")
+        self.assertIsNone(versioning.VersionIndex([]).latest())
+
+    def test_latest_in_major(self):
+        self.assertEqual(self.index.latest_in_major(3), "v3.1.0")
+        self.assertEqual(self.index.latest_in_major(2), "v2.0.0")
+        self.assertIsNone(self.index.latest_in_major(4))
+        self.assertIsNone(self.index.latest_in_major(11))
+
+    def test_newer_than(self):
+        self.assertEqual(self.index.newer_than((3, 0, 5)), ["v3.1.0", "v10.0.1"])
+        self.assertEqual(self.index.newer_than((10, 0, 1)), [])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,16 +1,148 @@
 from __future__ import annotations
 
+import functools
 import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
+from typing import Iterable
 
-from update_actions.github_api import fetch_release_tags
+from update_actions.github_api import (
+    fetch_release_tags,
+    fetch_release_tags_cached,
+    fetch_release_tags_graphql,
+    fetch_release_tags_ls_remote,
+    fetch_release_tags_streaming,
+    use_scheduler,
+)
+from update_actions.rate_limit import RequestScheduler
+from update_actions.release_cache import ReleaseCache
+from update_actions.scan_manifest import ScanManifest
 from update_actions.scanner import (
     apply_updates,
+    build_rewrite_index,
     collect_workflow_files,
-    find_uses_in_file,
     granularize_tag,
+    scan_uses_in_file,
 )
-from update_actions.versioning import parse_version, select_latest_tag
+from update_actions.versioning import VersionIndex, version_key
+
+DEFAULT_MAX_CONCURRENCY = 8
+
+# Start a process pool for parsing only from this many workflow files. Worker
+# startup costs more than parsing a few files.
+PARALLEL_SCAN_THRESHOLD = 200
+
+# "rest" requests every release page of each repository. "graphql" resolves
+# batches of repositories in one aliased query. "stream" requests release pages
+# only until a page cannot hold a newer version. "git" lists every tag with one
+# ``git ls-remote`` call per repository.
+RELEASE_SOURCES = ("rest", "graphql", "stream", "git")
+
+
+def fetch_all_release_tags(
+    repos: list[str],
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    release_source: str = "rest",
+    cache_dir: Path | None = None,
+) -> dict[str, list[str]]:
+    """Look up release tags for each repository with a bounded worker pool.
+
+    The result keeps the order of ``repos``, so later output stays
+    deterministic. The lookup functions report per-repository failures.
+    With ``cache_dir``, REST lookups send conditional requests and reuse the
+    cached tags for unchanged repositories. Streaming lookups return partial
+    lists, so they do not use the cache. ``git ls-remote`` has no conditional
+    requests, so git lookups do not use it either.
+    """
+    if release_source == "graphql":
+        return fetch_release_tags_graphql(repos)
+
+    if release_source not in RELEASE_SOURCES:
+        raise ValueError(f"Unknown release source: {release_source}")
+
+    cache = None
+    lookup = fetch_release_tags
+    if release_source == "stream":
+        lookup = fetch_release_tags_streaming
+    elif release_source == "git":
+        lookup = fetch_release_tags_ls_remote
+    elif cache_dir is not None:
+        cache = ReleaseCache(cache_dir / "releases")
+        lookup = functools.partial(fetch_release_tags_cached, cache=cache)
+
+    if max_concurrency <= 1 or len(repos) <= 1:
+        tags = {repo: lookup(repo) for repo in repos}
+    else:
+        # Each lookup waits on the network, so threads are sufficient.
+        workers = min(max_concurrency, len(repos))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            tags = dict(zip(repos, pool.map(lookup, repos)))
+
+    if cache is not None:
+        cache.prune()
+    return tags
+
+
+def scan_workflow_files(
+    paths: list[Path], jobs: int = 0, manifest: ScanManifest | None = None
+) -> list[list[tuple[int | None, str]]]:
+    """Run ``scan_uses_in_file`` for each path, in order.
+
+    Return only the (line, value) records. The rewrite phase reads the text of
+    files that change again, so peak memory does not grow with the tree.
+
+    ``jobs`` sets the number of parser processes. The default, 0, uses one
+    process per CPU from ``PARALLEL_SCAN_THRESHOLD`` files and parses smaller
+    sets in this process. A value of 1 always parses in this process.
+
+    With ``manifest``, parse only files whose content hash changed. Reuse the
+    stored locations for the other files and save the updated manifest.
+    """
+    if manifest is None:
+        return _parse_workflow_files(paths, jobs)
+
+    scans = {}
+    digests = {}
+    stale = []
+    for path in paths:
+        digests[path] = manifest.digest(path.read_bytes())
+        locations = manifest.get(path, digests[path])
+        if locations is None:
+            stale.append(path)
+            continue
+
+        scans[path] = _compact(locations)
+
+    for path, locations in zip(stale, _parse_workflow_files(stale, jobs)):
+        manifest.put(path, digests[path], locations)
+        scans[path] = locations
+
+    manifest.save()
+    return [scans[path] for path in paths]
+
+
+def _compact(locations: list[tuple[int | None, str]]) -> list[tuple[int | None, str]]:
+    # Most files repeat the same few values. Keep one copy of each string.
+    return [(line, sys.intern(value)) for line, value in locations]
+
+
+def _parse_workflow_files(
+    paths: list[Path], jobs: int
+) -> list[list[tuple[int | None, str]]]:
+    if jobs == 0:
+        jobs = (os.cpu_count() or 1) if len(paths) >= PARALLEL_SCAN_THRESHOLD else 1
+
+    workers = min(jobs, len(paths))
+    if workers <= 1:
+        return [_compact(scan_uses_in_file(path)) for path in paths]
+
+    # Send files in chunks. One task per file spends more time on inter-process
+    # messages than on parsing.
+    chunksize = max(1, len(paths) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(scan_uses_in_file, paths, chunksize=chunksize)
+        return [_compact(locations) for locations in results]
 
 
 def update_actions(
@@ -18,18 +150,139 @@ def update_actions(
     file_glob: str,
     excluded_actions: list[str],
     dry_run: bool,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    release_source: str = "rest",
+    cache_dir: Path | None = None,
+    jobs: int = 0,
+    full_rescan: bool = False,
 ) -> int:
     workflow_files = collect_workflow_files(root, file_glob)
     if not workflow_files:
         print("No workflow files found.")
         return 0
 
+    # Parse each file once. The rewrite phase uses the recorded key lines.
+    manifest = _open_manifest(cache_dir, full_rescan)
+    scans = scan_workflow_files(workflow_files, jobs, manifest)
+    file_locations = dict(zip(workflow_files, scans))
+
+    filtered_uses = _filter_uses(scans, excluded_actions)
+    if not filtered_uses:
+        print("No matching action uses entries found.")
+        return 0
+
+    release_indexes = _lookup_release_indexes(
+        _release_repos(filtered_uses), max_concurrency, release_source, cache_dir
+    )
+    return _update_root(
+        file_locations,
+        filtered_uses,
+        release_indexes,
+        dry_run,
+        os.environ.get("GITHUB_OUTPUT"),
+    )
+
+
+def update_actions_batch(
+    roots: list[Path],
+    file_glob: str,
+    excluded_actions: list[str],
+    dry_run: bool,
+    records_dir: Path,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    release_source: str = "rest",
+    cache_dir: Path | None = None,
+    jobs: int = 0,
+    full_rescan: bool = False,
+) -> int:
+    """Update many repository roots with one release lookup per repository.
+
+    Scan the workflow files of all roots together, look up the union of their
+    release repositories once, and then update each root on its own. Each root
+    gets a record file in ``records_dir`` in the ``GITHUB_OUTPUT`` format. The
+    file is empty when the root has no updates.
+    """
+    roots = list(dict.fromkeys(roots))
+    root_files = {root: collect_workflow_files(root, file_glob) for root in roots}
+    # Nested roots can share files. Parse each file once.
+    all_files = list(dict.fromkeys(p for files in root_files.values() for p in files))
+    manifest = _open_manifest(cache_dir, full_rescan)
+    scans = dict(zip(all_files, scan_workflow_files(all_files, jobs, manifest)))
+
+    root_uses = {}
+    release_repos: dict[str, None] = {}
+    for root, files in root_files.items():
+        root_uses[root] = _filter_uses(
+            (scans[path] for path in files), excluded_actions
+        )
+        release_repos.update(dict.fromkeys(_release_repos(root_uses[root])))
+
+    release_indexes = _lookup_release_indexes(
+        release_repos, max_concurrency, release_source, cache_dir
+    )
+
+    records_dir.mkdir(parents=True, exist_ok=True)
+    for root, record_name in zip(roots, _record_names(roots)):
+        record_path = records_dir / record_name
+        record_path.write_text("", encoding="utf-8")
+        print(f"Processing {root}. Records: {record_path}")
+        if not root_files[root]:
+            print("No workflow files found.")
+            continue
+
+        if not root_uses[root]:
+            print("No matching action uses entries found.")
+            continue
+
+        file_locations = {path: scans[path] for path in root_files[root]}
+        _update_root(
+            file_locations, root_uses[root], release_indexes, dry_run, record_path
+        )
+
+    return 0
+
+
+def _record_names(roots: list[Path]) -> list[str]:
+    # Name each record file after its root directory. Number repeated names,
+    # skipping numbers that another root already uses as its own name.
+    names = []
+    used: set[str] = set()
+    for root in roots:
+        base = root.name or "root"
+        name = base
+        number = 1
+        while name in used:
+            number += 1
+            name = f"{base}-{number}"
+        used.add(name)
+        names.append(f"{name}.txt")
+    return names
+
+
+def _open_manifest(cache_dir: Path | None, full_rescan: bool) -> ScanManifest | None:
+    # With a cache directory, reparse only files that changed since the last
+    # run. ``full_rescan`` discards the stored results first.
+    if cache_dir is None:
+        return None
+
+    manifest = ScanManifest(cache_dir / "scan-manifest.json")
+    if full_rescan:
+        manifest.clear()
+    return manifest
+
+
+def _filter_uses(
+    scans: Iterable[list[tuple[int | None, str]]],
+    excluded_actions: list[str],
+) -> list[tuple[str, str, str]]:
+    """Return sorted (action ref, release repo, tag) entries of external actions.
+
+    Skip local and Docker actions, references without a tag, and excluded
+    owners, repositories, or action paths.
+    """
     uses_set = set()
-    file_cache = {}
-    for path in workflow_files:
-        uses, text = find_uses_in_file(path)
-        file_cache[path] = text
-        uses_set.update(uses)
+    for locations in scans:
+        uses_set.update(value for _, value in locations)
 
     excluded_actions_set = set(excluded_actions)
     filtered_uses: list[tuple[str, str, str]] = []
@@ -49,30 +302,58 @@ def update_actions(
 
         filtered_uses.append((action_ref, release_repo, current_tag))
 
-    if not filtered_uses:
-        print("No matching action uses entries found.")
-        return 0
+    return filtered_uses
+
+
+def _release_repos(filtered_uses: list[tuple[str, str, str]]) -> list[str]:
+    # Skip repositories whose references have no supported tag format.
+    release_repos: dict[str, None] = {}
+    for _, release_repo, current_tag in filtered_uses:
+        if version_key(current_tag) is not None:
+            release_repos.setdefault(release_repo)
+    return list(release_repos)
 
+
+def _lookup_release_indexes(
+    release_repos: Iterable[str],
+    max_concurrency: int,
+    release_source: str,
+    cache_dir: Path | None,
+) -> dict[str, VersionIndex]:
+    # Look up each release repository once before planning updates. One
+    # scheduler paces every lookup of this run and reports its budget.
+    with use_scheduler(RequestScheduler()) as scheduler:
+        release_tags_cache = fetch_all_release_tags(
+            list(release_repos), max_concurrency, release_source, cache_dir
+        )
+    if scheduler.requests:
+        print(scheduler.report())
+    # Parse each release list once. Many uses entries share a repository.
+    return {repo: VersionIndex(tags) for repo, tags in release_tags_cache.items()}
+
+
+def _update_root(
+    file_locations: dict[Path, list[tuple[int | None, str]]],
+    filtered_uses: list[tuple[str, str, str]],
+    release_indexes: dict[str, VersionIndex],
+    dry_run: bool,
+    output_path: str | Path | None,
+) -> int:
     upgrades: dict[tuple[str, str], str] = {}
     update_records: list[tuple[str, str, str]] = []
-    release_tags_cache: dict[str, list[str]] = {}
     for action_ref, release_repo, current_tag in filtered_uses:
-        current_version = parse_version(current_tag)
+        current_version = version_key(current_tag)
         if current_version is None:
             print(f"Skip {action_ref}@{current_tag}. The tag format is not supported.")
             continue
 
-        if release_repo not in release_tags_cache:
-            release_tags_cache[release_repo] = fetch_release_tags(release_repo)
-        tags = release_tags_cache[release_repo]
-
-        latest_tag = select_latest_tag(tags)
+        release_index = release_indexes[release_repo]
+        latest_tag = release_index.latest()
         if latest_tag is None:
             print(f"Skip {action_ref}@{current_tag}. No valid release tags exist.")
             continue
 
-        latest_version = parse_version(latest_tag)
-        if not latest_version or latest_version <= current_version:
+        if not release_index.newer_than(current_version):
             continue
 
         new_tag = granularize_tag(current_tag, latest_tag)
@@ -91,9 +372,22 @@ def update_actions(
         print("All matching actions are up to date.")
         return 0
 
+    rewrite_index = build_rewrite_index(upgrades)
     changes = 0
-    for path, text in file_cache.items():
-        updated = apply_updates(text, upgrades)
+    for path, locations in file_locations.items():
+        # Skip files without an upgraded value before any line-level work.
+        uses_lines = {
+            line
+            for line, value in locations
+            if line is not None and value in rewrite_index
+        }
+        if not uses_lines:
+            continue
+
+        # Read the text again only for files that change. One file is in
+        # memory at a time.
+        text = path.read_text(encoding="utf-8")
+        updated = apply_updates(text, upgrades, uses_lines, rewrite_index)
 
         if updated != text:
             changes += 1
@@ -108,9 +402,8 @@ def update_actions(
     if dry_run:
         print(f"Dry run complete. Files with updates: {changes}")
 
-    github_output = os.environ.get("GITHUB_OUTPUT")
-    if github_output:
-        with open(github_output, "a", encoding="utf-8") as output:
+    if output_path:
+        with open(output_path, "a", encoding="utf-8") as output:
             output.write("action_updates<<ENDOFUPDATES\n")
             for action_ref, current_tag, new_tag in update_records:
                 output.write(f"{action_ref}\t{current_tag}\t{new_tag}\n")
@@ -1,13 +1,22 @@
 from __future__ import annotations
 
+import functools
 import re
+from bisect import bisect_left, bisect_right
+from typing import Iterable
 
 import semver
 
 SEMVER_PATTERN = re.compile(r"^v?(\d+(?:\.\d+)*)$")
 
 
-def parse_version(tag: str) -> semver.VersionInfo | None:
+@functools.lru_cache(maxsize=65536)
+def version_key(tag: str) -> tuple[int, int, int] | None:
+    """Parse ``tag`` into a (major, minor, patch) tuple, or None.
+
+    Each distinct tag is parsed once per process. Release lists repeat across
+    uses entries, and integer tuples compare faster than version objects.
+    """
     match = SEMVER_PATTERN.match(tag)
     if not match:
         return None
@@ -19,21 +28,58 @@ def parse_version(tag: str) -> semver.VersionInfo | None:
     while len(parts) < 3:
         parts.append(0)
 
-    return semver.VersionInfo(parts[0], parts[1], parts[2])
+    return parts[0], parts[1], parts[2]
 
 
-def select_latest_tag(tags: list[str]) -> str | None:
-    best_tag = None
-    best_version = None
+def parse_version(tag: str) -> semver.VersionInfo | None:
+    key = version_key(tag)
+    if key is None:
+        return None
+
+    return semver.VersionInfo(*key)
+
+
+class VersionIndex:
+    """Release tags of one repository, sorted by version.
 
-    for tag in tags:
-        version = parse_version(tag)
+    Each tag is parsed once. Tags without a supported version are dropped.
+    When tags share a version, the most specific tag represents it, so
+    ``v5.0.0`` wins over a floating ``v5`` in any input order. Among equally
+    specific tags, the first one wins. Queries are bisect lookups over the
+    sorted keys.
+    """
 
-        if version is None:
-            continue
+    __slots__ = ("_keys", "_tags")
 
-        if best_version is None or version > best_version:
-            best_version = version
-            best_tag = tag
+    def __init__(self, tags: Iterable[str]) -> None:
+        by_key: dict[tuple[int, int, int], str] = {}
+        for tag in tags:
+            key = version_key(tag)
+            if key is None:
+                continue
+            kept = by_key.get(key)
+            if kept is None or tag.count(".") > kept.count("."):
+                by_key[key] = tag
 
-    return best_tag
+        self._keys = sorted(by_key)
+        self._tags = [by_key[key] for key in self._keys]
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def latest(self) -> str | None:
+        return self._tags[-1] if self._tags else None
+
+    def latest_in_major(self, major: int) -> str | None:
+        index = bisect_left(self._keys, (major + 1, 0, 0)) - 1
+        if index < 0 or self._keys[index][0] != major:
+            return None
+        return self._tags[index]
+
+    def newer_than(self, key: tuple[int, int, int]) -> list[str]:
+        """Return tags with a version above ``key``, in ascending order."""
+        return self._tags[bisect_right(self._keys, key) :]
+
+
+def select_latest_tag(tags: list[str]) -> str | None:
+    return VersionIndex(tags).latest()
@@ -0,0 +1,69 @@
+"""Compare the compose scan engines on a synthetic stack file.
+
+Run from the ``docker`` directory::
+
+    python -m benchmarks.bench_compose
+
+The stack file holds ``SERVICE_COUNT`` services with an image, environment,
+ports, and a healthcheck each. The report times the composed-node walk that
+``scan_compose`` uses and the round-trip loader that it falls back to.
+"""
+
+from __future__ import annotations
+
+import time
+from pathlib import Path
+
+from ruamel.yaml import YAML
+
+from update_docker.scanner import _compose_images, _round_trip_images
+
+SERVICE_COUNT = 2000
+ROUNDS = 3
+
+
+def stack_text() -> str:
+    lines = ["x-defaults: &defaults", "  restart: unless-stopped", "services:"]
+    for index in range(SERVICE_COUNT):
+        lines += [
+            f"  service-{index}:",
+            "    <<: *defaults",
+            f"    image: ghcr.io/acme/service-{index}:1.{index % 30}.0",
+            "    environment:",
+            f"      SERVICE_NAME: service-{index}",
+            '      LOG_LEVEL: "info"',
+            "    ports:",
+            f'      - "{10000 + index}:8080"',
+            "    healthcheck:",
+            '      test: ["CMD", "curl", "-f", "http://localhost:8080/health"]',
+            "      interval: 30s",
+        ]
+    return "\n".join(lines) + "\n"
+
+
+def best_of(function) -> float:
+    times = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main() -> None:
+    text = stack_text()
+    path = Path("docker-compose.yml")
+    assert _compose_images(text) == _round_trip_images(path, text)
+
+    parser = YAML(typ="safe").Parser
+    print(f"{SERVICE_COUNT} services, {len(text) / 2**20:.1f} MiB")
+    print(
+        f"node walk ({parser.__name__}) {best_of(lambda: _compose_images(text)):8.2f} s"
+    )
+    print(
+        f"round trip          {best_of(lambda: _round_trip_images(path, text)):8.2f} s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""Measure scan and planning cost for a synthetic tree of image references.
+
+Run from the ``docker`` directory::
+
+    python -m benchmarks.bench_refs
+
+The tree holds ``FILE_COUNT`` Dockerfiles with ``REFS_PER_FILE`` ``FROM``
+lines each. The report compares the retained memory of the scanned references
+with plain frozen dataclasses and separate strings, the representation before
+slots and interning.
+"""
+
+from __future__ import annotations
+
+import random
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass
+from pathlib import Path
+
+from update_docker import versioning
+from update_docker.scanner import scan_dockerfiles
+
+FILE_COUNT = 1000
+REFS_PER_FILE = 100
+TAGS_PER_REPO = 2000
+
+REPOS = [
+    "node",
+    "python",
+    "rust",
+    "golang",
+    "redis",
+    "ghcr.io/acme/api",
+    "ghcr.io/acme/worker",
+    "public.ecr.aws/acme/lambda",
+]
+SUFFIXES = ["", "-alpine", "-slim-bookworm", "-bullseye", "-alpine3.20"]
+
+
+@dataclass(frozen=True)
+class _PlainImageRef:
+    source_path: Path
+    line_number: int
+    source_kind: str
+    registry: str
+    repo: str
+    tag: str
+
+
+def random_tag(rng: random.Random) -> str:
+    numeric = ".".join(str(rng.randint(0, 30)) for _ in range(rng.randint(1, 3)))
+    return f"{numeric}{rng.choice(SUFFIXES)}"
+
+
+def write_tree(root: Path, rng: random.Random) -> None:
+    for index in range(FILE_COUNT):
+        lines = [
+            f"FROM {rng.choice(REPOS)}:{random_tag(rng)}" for _ in range(REFS_PER_FILE)
+        ]
+        directory = root / f"service-{index}"
+        directory.mkdir()
+        (directory / "Dockerfile").write_text("\n".join(lines) + "\n", "utf-8")
+
+
+def retained(function):
+    """Return the result of ``function`` and the memory it still holds."""
+    tracemalloc.start()
+    result = function()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def select_latest_linear(tags: list[str], current) -> str | None:
+    # The selection before VariantIndex: parse and compare every tag.
+    best_tag = None
+    best_version = None
+    for tag in tags:
+        variant = versioning.parse_image_tag.__wrapped__(tag)
+        if variant is None:
+            continue
+        if variant.prefix != current.prefix or variant.suffix != current.suffix:
+            continue
+        version = variant.version
+        if version <= current.version:
+            continue
+        if best_version is None or version > best_version:
+            best_version = version
+            best_tag = tag
+    return best_tag
+
+
+def main() -> None:
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir)
+        write_tree(root, rng)
+        refs, scan_time = timed(lambda: scan_dockerfiles(root, "**/Dockerfile"))
+        _, memory = retained(lambda: scan_dockerfiles(root, "**/Dockerfile"))
+
+    def plain_copies():
+        # Copy the strings, as separate scans produced them before interning.
+        return [
+            _PlainImageRef(
+                ref.source_path,
+                ref.line_number,
+                ref.source_kind,
+                "".join(ref.registry),
+                "".join(ref.repo),
+                "".join(ref.tag),
+            )
+            for ref in refs
+        ]
+
+    _, plain_memory = retained(plain_copies)
+    print(f"{len(refs)} references in {FILE_COUNT} files")
+    print(f"scan                {scan_time:8.2f} s")
+    print(f"retained refs       {memory / 2**20:8.1f} MiB")
+    print(f"plain dataclasses   {plain_memory / 2**20:8.1f} MiB")
+
+    repos = sorted({ref.crane_repo for ref in refs})
+    tag_lists = {
+        repo: [random_tag(rng) for _ in range(TAGS_PER_REPO)] for repo in repos
+    }
+    indexes, index_time = timed(
+        lambda: {
+            repo: versioning.VariantIndex(tags) for repo, tags in tag_lists.items()
+        }
+    )
+    print(f"index {len(repos)} x {TAGS_PER_REPO} tags {index_time:8.2f} s")
+
+    def plan(select):
+        return sum(
+            1
+            for ref in refs
+            if (current := versioning.parse_image_tag(ref.tag)) is not None
+            and select(ref.crane_repo, current) is not None
+        )
+
+    indexed, plan_time = timed(
+        lambda: plan(lambda repo, current: indexes[repo].latest_matching(current))
+    )
+    print(f"plan with index     {plan_time:8.2f} s")
+
+    # The linear scan is slow. Time a sample and scale it.
+    sample = refs[:1000]
+    _, sample_time = timed(
+        lambda: [
+            select_latest_linear(tag_lists[ref.crane_repo], current)
+            for ref in sample
+            if (current := versioning.parse_image_tag(ref.tag)) is not None
+        ]
+    )
+    print(f"plan linear (est.)  {sample_time * len(refs) / len(sample):8.2f} s")
+    print(f"references with a newer tag: {indexed}")
+
+
+if __name__ == "__main__":
+    main()
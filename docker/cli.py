@@ -3,7 +3,29 @@ import argparse
 import os
 from pathlib import Path
 
-from update_docker.updater import update_docker
+from update_docker.crane import crane_list
+from update_docker.registry import RegistryClient
+from update_docker.tag_cache import DEFAULT_TTL_SECONDS
+from update_docker.updater import (
+    DEFAULT_MAX_CONCURRENCY,
+    DEFAULT_REGISTRY_CONCURRENCY,
+    TAG_SOURCES,
+    update_docker,
+)
+
+
+def positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"{value} is not a positive integer")
+    return number
+
+
+def non_negative_float(value: str) -> float:
+    number = float(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"{value} is a negative number")
+    return number
 
 
 def parse_args() -> argparse.Namespace:
@@ -46,6 +68,47 @@ def parse_args() -> argparse.Namespace:
         action="store_true",
         help="Print planned updates. Do not modify files.",
     )
+    parser.add_argument(
+        "--max-concurrency",
+        type=positive_int,
+        default=DEFAULT_MAX_CONCURRENCY,
+        help=(
+            "Maximum number of concurrent tag lookups. "
+            f"The default is {DEFAULT_MAX_CONCURRENCY}."
+        ),
+    )
+    parser.add_argument(
+        "--registry-concurrency",
+        type=positive_int,
+        default=DEFAULT_REGISTRY_CONCURRENCY,
+        help=(
+            "Maximum number of concurrent tag lookups against one registry. "
+            f"The default is {DEFAULT_REGISTRY_CONCURRENCY}."
+        ),
+    )
+    parser.add_argument(
+        "--tag-source",
+        choices=TAG_SOURCES,
+        default="crane",
+        help=(
+            "Tag lookup backend. crane runs crane ls per repository. registry "
+            "uses the built-in Registry V2 client with pooled connections."
+        ),
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default="",
+        help=("Directory for cached tag lists. An empty value disables the cache."),
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        type=non_negative_float,
+        default=DEFAULT_TTL_SECONDS,
+        help=(
+            "Seconds before a cached tag list is revalidated. "
+            f"The default is {DEFAULT_TTL_SECONDS}."
+        ),
+    )
     return parser.parse_args()
 
 
@@ -55,14 +118,24 @@ def main() -> int:
     excluded = [
         item.strip() for item in args.excluded_images.split(",") if item.strip()
     ]
-    return update_docker(
-        root=root,
-        dockerfile_glob=args.dockerfile_glob,
-        compose_glob=args.compose_glob,
-        markdown_glob=args.markdown_glob,
-        excluded_images=excluded,
-        dry_run=args.dry_run,
-    )
+    client = RegistryClient() if args.tag_source == "registry" else None
+    try:
+        return update_docker(
+            root=root,
+            dockerfile_glob=args.dockerfile_glob,
+            compose_glob=args.compose_glob,
+            markdown_glob=args.markdown_glob,
+            excluded_images=excluded,
+            dry_run=args.dry_run,
+            tag_lister=client.list_tags if client is not None else crane_list,
+            max_concurrency=args.max_concurrency,
+            registry_concurrency=args.registry_concurrency,
+            cache_dir=Path(args.cache_dir).resolve() if args.cache_dir else None,
+            cache_ttl=args.cache_ttl,
+        )
+    finally:
+        if client is not None:
+            client.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+from bisect import bisect_right
+from typing import Mapping
+
+
+class LineIndex:
+    """Newline offsets of one text, computed once.
+
+    Lines end at ``"\\n"`` only. ``Path.read_text`` turns ``"\\r\\n"`` and
+    ``"\\r"`` into ``"\\n"``, but form feeds and Unicode separators such as
+    ``"\\u2028"`` stay inside a line, unlike ``str.splitlines``. Scanners that
+    report lines for the editor count them the same way. ``line_number`` maps
+    a character offset to its line with a bisect. ``line`` returns one line
+    without a split of the whole text. ``splice`` replaces many lines and
+    joins the result once.
+    """
+
+    __slots__ = ("text", "_starts")
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+        starts = [0]
+        find = text.find
+        position = find("\n")
+        while position != -1:
+            starts.append(position + 1)
+            position = find("\n", position + 1)
+        self._starts = starts
+
+    def __len__(self) -> int:
+        # A final newline ends the last line. It does not start a new one.
+        if self._starts[-1] == len(self.text):
+            return len(self._starts) - 1
+        return len(self._starts)
+
+    def line_number(self, offset: int) -> int:
+        """Return the one-based line that contains ``offset``."""
+        return bisect_right(self._starts, offset)
+
+    def _span(self, number: int) -> tuple[int, int]:
+        start = self._starts[number - 1]
+        end = self._starts[number] if number < len(self._starts) else len(self.text)
+        return start, end
+
+    def line(self, number: int) -> str | None:
+        """Return line ``number`` with its newline, or None when out of range."""
+        if not 1 <= number <= len(self):
+            return None
+        start, end = self._span(number)
+        return self.text[start:end]
+
+    def splice(self, replacements: Mapping[int, str]) -> str:
+        """Return the text with whole lines replaced.
+
+        ``replacements`` maps line numbers from 1 to ``len(self)`` to new
+        lines that keep their line ending. The unchanged spans and the new
+        lines are joined once, so the cost does not grow with the number of
+        replacements.
+        """
+        pieces: list[str] = []
+        position = 0
+        for number in sorted(replacements):
+            start, end = self._span(number)
+            pieces.append(self.text[position:start])
+            pieces.append(replacements[number])
+            position = end
+        pieces.append(self.text[position:])
+        return "".join(pieces)
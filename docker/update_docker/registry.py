@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+import http.client
+import json
+import re
+import ssl
+import sys
+import threading
+import time
+import urllib.parse
+from typing import Iterator
+
+# Docker Hub serves the registry API on another host than its image names.
+_REGISTRY_HOSTS = {"docker.io": "registry-1.docker.io"}
+
+# Tags per page. Registries may return fewer and cap larger values.
+DEFAULT_PAGE_SIZE = 1000
+MAX_ATTEMPTS = 3
+
+_NEXT_LINK_RE = re.compile(r'<([^>]+)>\s*;\s*rel="?next"?')
+_CHALLENGE_PARAM_RE = re.compile(r'(\w+)="([^"]*)"')
+
+
+class RegistryError(Exception):
+    """A registry request failed."""
+
+
+def _is_local(host: str) -> bool:
+    # Like crane, talk plain HTTP to registries on the local machine.
+    hostname = host.rsplit(":", 1)[0] if host.count(":") == 1 else host
+    return hostname in {"localhost", "127.0.0.1", "[::1]"}
+
+
+def registry_of(crane_repo: str) -> str:
+    """Return the registry host of a crane repository name."""
+    first, _, rest = crane_repo.partition("/")
+    if rest and ("." in first or ":" in first or first == "localhost"):
+        return first
+    return "docker.io"
+
+
+def parse_challenge(header: str) -> tuple[str, dict[str, str]]:
+    """Split a ``WWW-Authenticate`` header into its scheme and parameters."""
+    scheme, _, params = header.strip().partition(" ")
+    return scheme.lower(), dict(_CHALLENGE_PARAM_RE.findall(params))
+
+
+class RegistryClient:
+    """List image tags with the Docker Registry HTTP API V2.
+
+    ``list_tags`` has the ``tag_lister`` interface of ``crane_list``. The
+    client keeps idle HTTP connections per host for reuse, so each registry
+    and token service needs one TLS handshake per worker thread, not one per
+    repository. It remembers the bearer challenge of each registry and caches
+    tokens by realm, service, and scope. A realm that issues tokens without a
+    scope then serves every repository with one token. The client is safe to
+    share between the lookup threads.
+    """
+
+    def __init__(self, timeout: float = 30, page_size: int = DEFAULT_PAGE_SIZE) -> None:
+        self.timeout = timeout
+        self.page_size = page_size
+        self._lock = threading.Lock()
+        self._idle: dict[tuple[str, str], list[http.client.HTTPConnection]] = {}
+        self._challenges: dict[str, dict[str, str]] = {}
+        self._tokens: dict[tuple[str, str, str], tuple[str, float]] = {}
+        self._ssl_context = ssl.create_default_context()
+
+    def list_tags(self, repo: str) -> list[str]:
+        """Return tags for a complete repository name, as ``crane ls`` does.
+
+        On failure, log a GitHub Actions warning and return an empty list.
+        """
+        try:
+            return list(self.iter_tags(repo))
+        except (OSError, RegistryError, http.client.HTTPException, ValueError) as exc:
+            print(f"::warning::Failed to list tags for {repo}: {exc}", file=sys.stderr)
+            return []
+
+    def iter_tags(self, repo: str) -> Iterator[str]:
+        """Yield the tags of ``repo`` page by page.
+
+        Follow the ``Link`` header of each page. Without one, continue with
+        ``last`` set to the final tag of a full page.
+        """
+        registry, path = self._split_repo(repo)
+        host = _REGISTRY_HOSTS.get(registry, registry)
+        scheme = "http" if _is_local(host) else "https"
+        query = urllib.parse.urlencode({"n": self.page_size})
+        url = f"{scheme}://{host}/v2/{path}/tags/list?{query}"
+        while url:
+            status, headers, body = self._get(url, registry, path)
+            if status == 404:
+                raise RegistryError("repository not found")
+            if status != 200:
+                raise RegistryError(f"HTTP {status}")
+
+            tags = json.loads(body).get("tags") or []
+            yield from tags
+
+            link = headers.get("Link")
+            match = _NEXT_LINK_RE.search(link) if link else None
+            if match:
+                url = urllib.parse.urljoin(url, match.group(1))
+            elif len(tags) >= self.page_size:
+                query = urllib.parse.urlencode({"n": self.page_size, "last": tags[-1]})
+                url = f"{scheme}://{host}/v2/{path}/tags/list?{query}"
+            else:
+                url = None
+
+    def close(self) -> None:
+        with self._lock:
+            connections = [c for idle in self._idle.values() for c in idle]
+            self._idle.clear()
+        for connection in connections:
+            connection.close()
+
+    @staticmethod
+    def _split_repo(repo: str) -> tuple[str, str]:
+        # ``crane_repo`` leaves out the docker.io registry.
+        registry = registry_of(repo)
+        if registry == "docker.io":
+            return registry, repo
+        return registry, repo[len(registry) + 1 :]
+
+    def _get(
+        self, url: str, registry: str, path: str
+    ) -> tuple[int, http.client.HTTPMessage, bytes]:
+        scope = f"repository:{path}:pull"
+        for attempt in range(MAX_ATTEMPTS):
+            headers = self._authorization(registry, scope)
+            try:
+                status, response_headers, body = self._request(url, headers)
+            except (OSError, http.client.HTTPException):
+                if attempt == MAX_ATTEMPTS - 1:
+                    raise
+                time.sleep(2**attempt)
+                continue
+
+            if status == 401 and attempt < MAX_ATTEMPTS - 1:
+                challenge = response_headers.get("WWW-Authenticate", "")
+                if not self._remember_challenge(registry, challenge, scope):
+                    return status, response_headers, body
+                continue
+            if (status == 429 or status >= 500) and attempt < MAX_ATTEMPTS - 1:
+                time.sleep(2**attempt)
+                continue
+            return status, response_headers, body
+        raise RegistryError("request failed")
+
+    def _remember_challenge(self, registry: str, header: str, scope: str) -> bool:
+        scheme, params = parse_challenge(header)
+        if scheme != "bearer" or "realm" not in params:
+            return False
+
+        with self._lock:
+            previous = self._challenges.get(registry)
+            self._challenges[registry] = params
+            # A second 401 with the same challenge means the token is invalid.
+            key = (
+                params["realm"],
+                params.get("service", ""),
+                self._scope(params, scope),
+            )
+            if previous == params:
+                self._tokens.pop(key, None)
+        return True
+
+    @staticmethod
+    def _scope(challenge: dict[str, str], scope: str) -> str:
+        # Without a scope in the challenge, one token covers the realm.
+        return scope if "scope" in challenge else ""
+
+    def _authorization(self, registry: str, scope: str) -> dict[str, str]:
+        with self._lock:
+            challenge = self._challenges.get(registry)
+        if challenge is None:
+            return {}
+
+        key = (
+            challenge["realm"],
+            challenge.get("service", ""),
+            self._scope(challenge, scope),
+        )
+        with self._lock:
+            cached = self._tokens.get(key)
+        if cached is None or cached[1] <= time.monotonic():
+            cached = self._fetch_token(*key)
+            with self._lock:
+                self._tokens[key] = cached
+        return {"Authorization": f"Bearer {cached[0]}"}
+
+    def _fetch_token(self, realm: str, service: str, scope: str) -> tuple[str, float]:
+        params = {}
+        if service:
+            params["service"] = service
+        if scope:
+            params["scope"] = scope
+        separator = "&" if "?" in realm else "?"
+        url = f"{realm}{separator}{urllib.parse.urlencode(params)}" if params else realm
+        status, _, body = self._request(url, {})
+        if status != 200:
+            raise RegistryError(f"token request failed with HTTP {status}")
+
+        data = json.loads(body)
+        token = data.get("token") or data.get("access_token")
+        if not token:
+            raise RegistryError("token response has no token")
+        # Renew a little early. The default lifetime in the specification is 60 s.
+        expires_in = int(data.get("expires_in") or 60)
+        return token, time.monotonic() + max(expires_in - 10, 1)
+
+    def _request(
+        self, url: str, headers: dict[str, str]
+    ) -> tuple[int, http.client.HTTPMessage, bytes]:
+        parts = urllib.parse.urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        target = parts.path + (f"?{parts.query}" if parts.query else "")
+        headers = {
+            "Accept": "application/json",
+            "User-Agent": "update-docker",
+            **headers,
+        }
+        while True:
+            connection, reused = self._checkout(key)
+            try:
+                connection.request("GET", target, headers=headers)
+                response = connection.getresponse()
+                # Read the whole body so the connection can serve the next
+                # request.
+                body = response.read()
+            except (ConnectionError, http.client.RemoteDisconnected):
+                connection.close()
+                # The server closed an idle connection. Retry on a new one.
+                if reused:
+                    continue
+                raise
+            except BaseException:
+                connection.close()
+                raise
+
+            if response.will_close:
+                connection.close()
+            else:
+                self._checkin(key, connection)
+            return response.status, response.headers, body
+
+    def _checkout(
+        self, key: tuple[str, str]
+    ) -> tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop(), True
+
+        scheme, netloc = key
+        if scheme == "http":
+            connection = http.client.HTTPConnection(netloc, timeout=self.timeout)
+        else:
+            connection = http.client.HTTPSConnection(
+                netloc, timeout=self.timeout, context=self._ssl_context
+            )
+        return connection, False
+
+    def _checkin(
+        self, key: tuple[str, str], connection: http.client.HTTPConnection
+    ) -> None:
+        with self._lock:
+            self._idle.setdefault(key, []).append(connection)
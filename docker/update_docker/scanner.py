@@ -1,17 +1,22 @@
 from __future__ import annotations
 
+import functools
+import mmap
 import re
 import sys
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Iterator, Literal
+from typing import Callable, Iterable, Iterator, Literal
 
 from ruamel.yaml import YAML
+from ruamel.yaml.nodes import MappingNode, Node, ScalarNode, SequenceNode
+
+from update_docker.lines import LineIndex
 
 SourceKind = Literal["dockerfile", "compose", "markdown"]
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class ImageRef:
     source_path: Path
     line_number: int
@@ -20,6 +25,13 @@ class ImageRef:
     repo: str
     tag: str
 
+    def __post_init__(self) -> None:
+        # Large trees repeat a few registries and repositories many times.
+        # Keep one copy of each string.
+        object.__setattr__(self, "registry", sys.intern(self.registry))
+        object.__setattr__(self, "repo", sys.intern(self.repo))
+        object.__setattr__(self, "tag", sys.intern(self.tag))
+
     @property
     def display(self) -> str:
         # Render the canonical "registry/repo:tag" form for logs and pull request rows.
@@ -94,7 +106,9 @@ def scan_dockerfile(path: Path) -> list[ImageRef]:
     when the token matches an alias in the same file.
     """
     text = path.read_text(encoding="utf-8")
-    lines = text.splitlines()
+    # Number lines at "\n" only, like the LineIndex that the editor uses.
+    # ``splitlines`` also breaks at form feeds and Unicode separators.
+    lines = text.split("\n")
 
     # First, collect stage aliases in declaration order.
     aliases: list[str] = []
@@ -162,9 +176,99 @@ def _walk_compose(node, callback) -> None:
         _walk_compose(value, callback)
 
 
-def scan_compose(path: Path) -> list[ImageRef]:
-    """Return image references from a docker-compose file."""
-    text = path.read_text(encoding="utf-8")
+_STR_TAG = "tag:yaml.org,2002:str"
+# The C parser counts these characters in quoted scalars as line breaks. The
+# round-trip loader and LineIndex do not.
+_C_PARSER_LINE_BREAKS = ("\x85", "\u2028", "\u2029")
+_MERGE_TAG = "tag:yaml.org,2002:merge"
+
+
+def _node_key(node: Node) -> tuple[str, object]:
+    if isinstance(node, ScalarNode):
+        return node.tag, node.value
+    return node.tag, id(node)
+
+
+def _mapping_pairs(node: MappingNode) -> list[tuple[Node, Node, bool]]:
+    """Return ``(key, value, own)`` for each entry of a mapping node.
+
+    Own entries come first, then the entries that ``<<`` merges add, as
+    ``CommentedMap.values`` orders them.
+    """
+    pairs: list[tuple[Node, Node, bool]] = []
+    seen: set[tuple[str, object]] = set()
+    merges: list[Node] = []
+    for key, value in node.value:
+        if key.tag == _MERGE_TAG:
+            merges.append(value)
+            continue
+        node_key = _node_key(key)
+        if node_key in seen:
+            # The round-trip loader rejects duplicate keys. Let it report them.
+            raise ValueError(f"duplicate key {key.value!r}")
+        seen.add(node_key)
+        pairs.append((key, value, True))
+
+    for value in merges:
+        sources = value.value if isinstance(value, SequenceNode) else [value]
+        for source in sources:
+            if not isinstance(source, MappingNode):
+                raise ValueError("merge value is not a mapping")
+            for key, merged, _ in _mapping_pairs(source):
+                node_key = _node_key(key)
+                if node_key not in seen:
+                    seen.add(node_key)
+                    pairs.append((key, merged, False))
+    return pairs
+
+
+def _walk_compose_nodes(node: Node, callback) -> None:
+    """Visit each ``image:`` key in a composed node tree.
+
+    Mirror ``_walk_compose``. Skip an ``image`` that a ``<<`` merge inherits,
+    but walk into merged values.
+    """
+    if isinstance(node, SequenceNode):
+        for item in node.value:
+            _walk_compose_nodes(item, callback)
+        return
+
+    if not isinstance(node, MappingNode):
+        return
+
+    pairs = _mapping_pairs(node)
+    for key, value, own in pairs:
+        if (
+            own
+            and key.tag == _STR_TAG
+            and key.value == "image"
+            and isinstance(value, ScalarNode)
+            and value.tag == _STR_TAG
+        ):
+            callback(value.value, key.start_mark.line + 1)
+            break
+
+    for _, value, _ in pairs:
+        _walk_compose_nodes(value, callback)
+
+
+def _compose_images(text: str) -> list[tuple[str, int]]:
+    """Return ``(image, line number)`` pairs from the node tree of ``text``.
+
+    The safe loader composes nodes with the C parser when it is available. It
+    does not construct Python objects, comments, or line-column data. Raise
+    when the text does not parse or needs the round-trip loader.
+    """
+    if any(character in text for character in _C_PARSER_LINE_BREAKS):
+        raise ValueError("text has line breaks that the C parser counts")
+    node = YAML(typ="safe").compose(text)
+    images: list[tuple[str, int]] = []
+    if isinstance(node, MappingNode):
+        _walk_compose_nodes(node, lambda image, line: images.append((image, line)))
+    return images
+
+
+def _round_trip_images(path: Path, text: str) -> list[tuple[str, int]] | None:
     yaml = YAML()
     yaml.preserve_quotes = True
     try:
@@ -174,17 +278,33 @@ def scan_compose(path: Path) -> list[ImageRef]:
             f"::warning file={path}::Failed to parse compose YAML: {exc}",
             file=sys.stderr,
         )
-        return []
+        return None
 
-    if not isinstance(doc, dict):
-        return []
+    images: list[tuple[str, int]] = []
+    if isinstance(doc, dict):
+        _walk_compose(doc, lambda image, line: images.append((image, line)))
+    return images
 
-    refs: list[ImageRef] = []
 
-    def collect(image: str, line_no: int) -> None:
+def scan_compose(path: Path) -> list[ImageRef]:
+    """Return image references from a docker-compose file.
+
+    Walk the composed nodes first. Fall back to the round-trip loader when
+    they fail, for example on YAML 1.2 syntax that the C parser rejects.
+    """
+    text = path.read_text(encoding="utf-8")
+    try:
+        images = _compose_images(text)
+    except Exception:
+        images = _round_trip_images(path, text)
+        if images is None:
+            return []
+
+    refs: list[ImageRef] = []
+    for image, line_no in images:
         split = _split_image_ref(image)
         if split is None:
-            return
+            continue
 
         registry, repo, tag = split
         refs.append(
@@ -197,8 +317,6 @@ def scan_compose(path: Path) -> list[ImageRef]:
                 tag=tag,
             )
         )
-
-    _walk_compose(doc, collect)
     return refs
 
 
@@ -223,13 +341,17 @@ def scan_compose_files(root: Path, glob: str) -> list[ImageRef]:
     return refs
 
 
+# Leading lookbehind rejects partial matches, such as ``my-rust:1.94-alpine``
+# when the action updates ``rust:1.94-alpine``.
+# Trailing lookahead rejects only text that can extend the tag, such as word
+# characters or dashes. Punctuation, such as ``.``, ``,``, and ``)``, does not
+# block a replacement.
+_MARKDOWN_BEFORE = r"(?<![\w./-])"
+_MARKDOWN_AFTER = r"(?![\w-])"
+
+
 def _markdown_pattern(needle: str) -> re.Pattern[str]:
-    # Leading lookbehind rejects partial matches, such as ``my-rust:1.94-alpine``
-    # when the action updates ``rust:1.94-alpine``.
-    # Trailing lookahead rejects only text that can extend the tag, such as
-    # word characters or dashes. Punctuation, such as ``.``, ``,``, and ``)``,
-    # does not block a replacement.
-    return re.compile(rf"(?<![\w./-]){re.escape(needle)}(?![\w-])")
+    return re.compile(f"{_MARKDOWN_BEFORE}{re.escape(needle)}{_MARKDOWN_AFTER}")
 
 
 def _ref_needles(ref: ImageRef) -> list[str]:
@@ -250,61 +372,176 @@ def find_markdown_occurrences(
     library images. Use word-style boundaries.
     """
     text = path.read_text(encoding="utf-8")
+    lines = LineIndex(text)
     for ref in candidates:
         for needle in _ref_needles(ref):
             for match in _markdown_pattern(needle).finditer(text):
-                yield ref, text.count("\n", 0, match.start()) + 1
+                yield ref, lines.line_number(match.start())
 
 
-def replace_dockerfile_tag(text: str, ref: ImageRef, new_tag: str) -> str:
-    """Replace the tag on the matching ``FROM`` line."""
-    lines = text.splitlines(keepends=True)
-    target = ref.line_number - 1
-    if target < 0 or target >= len(lines):
-        return text
+def _edit_dockerfile_line(line: str, ref: ImageRef, new_tag: str) -> str | None:
+    """Return ``line`` with the tag of its ``FROM`` reference replaced.
 
-    line = lines[target]
+    Return None when the line does not hold ``ref``.
+    """
     match = _FROM_RE.match(line)
     if not match:
-        return text
+        return None
 
     old_ref = match.group("ref")
     if not old_ref.endswith(f":{ref.tag}"):
-        return text
+        return None
 
     new_ref = old_ref[: -len(ref.tag)] + new_tag
-    lines[target] = line.replace(old_ref, new_ref, 1)
-    return "".join(lines)
+    return line.replace(old_ref, new_ref, 1)
 
 
-def replace_compose_tag(text: str, ref: ImageRef, new_tag: str) -> str:
-    """Replace the image scalar on the parser-identified ``image:`` line."""
-    lines = text.splitlines(keepends=True)
-    target = ref.line_number - 1
-    if target < 0 or target >= len(lines):
-        return text
-
-    line = lines[target]
-    image_forms = sorted({ref.display, ref.full_ref}, key=len, reverse=True)
-    match = re.match(
-        rf"^(?P<prefix>\s*image\s*:\s*)(?P<quote>['\"]?)(?P<image>{'|'.join(re.escape(image) for image in image_forms)})(?P=quote)(?P<suffix>\s*(?:#.*)?(?:\r?\n)?)$",
-        line,
+@functools.lru_cache(maxsize=4096)
+def _compose_image_pattern(image_forms: tuple[str, ...]) -> re.Pattern[str]:
+    # Compile once per set of image forms. Services that share an image, and
+    # repeated runs over one tree, reuse the pattern.
+    alternation = "|".join(re.escape(image) for image in image_forms)
+    return re.compile(
+        rf"^(?P<prefix>\s*image\s*:\s*)(?P<quote>['\"]?)(?P<image>{alternation})(?P=quote)(?P<suffix>\s*(?:#.*)?(?:\r?\n)?)$"
     )
+
+
+def _edit_compose_line(line: str, ref: ImageRef, new_tag: str) -> str | None:
+    """Return the parser-identified ``image:`` line with its tag replaced.
+
+    Return None when the line does not hold ``ref``.
+    """
+    image_forms = tuple(sorted({ref.display, ref.full_ref}, key=len, reverse=True))
+    match = _compose_image_pattern(image_forms).match(line)
     if match is None:
-        return text
+        return None
 
     new_image = match.group("image")[: -len(ref.tag)] + new_tag
-    lines[target] = (
+    return (
         f"{match.group('prefix')}{match.group('quote')}{new_image}"
         f"{match.group('quote')}{match.group('suffix')}"
     )
-    return "".join(lines)
+
+
+_LineEditor = Callable[[str, ImageRef, str], str | None]
+
+_LINE_EDITORS: dict[str, _LineEditor] = {
+    "dockerfile": _edit_dockerfile_line,
+    "compose": _edit_compose_line,
+}
+
+
+def _edit_lines(text: str, edits: Iterable[tuple[ImageRef, str, _LineEditor]]) -> str:
+    # Index the lines once and join once, however many references the file
+    # holds. A later edit of the same line sees the earlier result.
+    lines = LineIndex(text)
+    replacements: dict[int, str] = {}
+    for ref, new_tag, editor in edits:
+        number = ref.line_number
+        line = replacements[number] if number in replacements else lines.line(number)
+        if line is None:
+            continue
+
+        new_line = editor(line, ref, new_tag)
+        if new_line is not None:
+            replacements[number] = new_line
+    return lines.splice(replacements) if replacements else text
+
+
+def apply_tag_edits(text: str, edits: Iterable[tuple[ImageRef, str]]) -> str:
+    """Apply many ``(reference, new tag)`` edits to the text of one file.
+
+    Each reference names its line and its kind, Dockerfile or compose. Edits
+    change one line each and may come in any order.
+    """
+    return _edit_lines(
+        text,
+        (
+            (ref, new_tag, _LINE_EDITORS[ref.source_kind])
+            for ref, new_tag in edits
+            if ref.source_kind in _LINE_EDITORS
+        ),
+    )
+
+
+def replace_dockerfile_tag(text: str, ref: ImageRef, new_tag: str) -> str:
+    """Replace the tag on the matching ``FROM`` line."""
+    return _edit_lines(text, [(ref, new_tag, _edit_dockerfile_line)])
+
+
+def replace_compose_tag(text: str, ref: ImageRef, new_tag: str) -> str:
+    """Replace the image scalar on the parser-identified ``image:`` line."""
+    return _edit_lines(text, [(ref, new_tag, _edit_compose_line)])
+
+
+class MarkdownRewriter:
+    """Replace the Markdown forms of many image updates in one scan.
+
+    Build one alternation of every needle, with the same boundaries as
+    ``_markdown_pattern``. Build it once per run. ``rewrite`` then passes over
+    each file once, not once per update and needle. The longest needle comes
+    first in the alternation. A reference such as ``app:1.2`` then wins over
+    ``app:1`` at the same position.
+    """
+
+    __slots__ = ("_pattern", "_prefilter", "_replacements")
+
+    def __init__(self, updates: Iterable[tuple[ImageRef, str]]) -> None:
+        # Map each needle to the index of its update and its replacement.
+        self._replacements: dict[str, tuple[int, str]] = {}
+        for index, (ref, new_tag) in enumerate(updates):
+            for needle in _ref_needles(ref):
+                replacement = needle[: -len(ref.tag)] + new_tag
+                self._replacements.setdefault(needle, (index, replacement))
+
+        needles = sorted(self._replacements, key=len, reverse=True)
+        self._pattern = None
+        self._prefilter = None
+        if needles:
+            alternation = "|".join(re.escape(needle) for needle in needles)
+            self._pattern = re.compile(
+                f"{_MARKDOWN_BEFORE}(?:{alternation}){_MARKDOWN_AFTER}"
+            )
+            # Every needle ends with "<last repo segment>:<tag>", in both the
+            # short and the full form. A file without these bytes has no match.
+            cores = {needle.rsplit("/", 1)[-1].encode("utf-8") for needle in needles}
+            self._prefilter = re.compile(
+                b"|".join(re.escape(core) for core in sorted(cores))
+            )
+
+    def may_match_file(self, path: Path) -> bool:
+        """Return whether ``path`` can contain a needle.
+
+        Search the raw bytes through a memory map. Skip decoding and the
+        boundary regex for files without a candidate.
+        """
+        if self._prefilter is None:
+            return False
+
+        with path.open("rb") as file:
+            try:
+                data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # An empty file cannot be mapped and has no needle.
+                return False
+            with data:
+                return self._prefilter.search(data) is not None
+
+    def rewrite(self, text: str) -> tuple[str, list[int]]:
+        """Return the updated text and the sorted indexes of matched updates."""
+        if self._pattern is None:
+            return text, []
+
+        matched: set[int] = set()
+
+        def replace(match: re.Match[str]) -> str:
+            index, replacement = self._replacements[match.group()]
+            matched.add(index)
+            return replacement
+
+        return self._pattern.sub(replace, text), sorted(matched)
 
 
 def replace_markdown_occurrences(text: str, ref: ImageRef, new_tag: str) -> str:
     """Replace each word-bounded occurrence of the reference display form."""
-    for needle in _ref_needles(ref):
-        replacement = needle[: -len(ref.tag)] + new_tag
-        text = _markdown_pattern(needle).sub(replacement, text)
-
-    return text
+    return MarkdownRewriter([(ref, new_tag)]).rewrite(text)[0]
@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+# Tag lists of popular images change a few times per day at most.
+DEFAULT_TTL_SECONDS = 6 * 60 * 60
+# Serve a stale entry while it revalidates for at most this long after storing.
+DEFAULT_MAX_STALE_SECONDS = 7 * 24 * 60 * 60
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+# Wait this long for a revalidation before a lookup falls back to stale tags.
+DEFAULT_REVALIDATE_TIMEOUT = 5.0
+
+
+@dataclass(frozen=True)
+class CachedTags:
+    tags: list[str]
+    stored_at: float
+    fresh: bool
+
+
+class TagCache:
+    """Store image tag lists on disk by crane repository name.
+
+    Each repository has one JSON file. An entry is fresh for ``ttl`` seconds
+    after it was stored and stale until ``max_stale`` seconds. Older entries
+    are removed. ``prune`` also removes the least recently used entries until
+    the directory is at most ``max_bytes``.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        ttl: float = DEFAULT_TTL_SECONDS,
+        max_stale: float = DEFAULT_MAX_STALE_SECONDS,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ) -> None:
+        self.directory = directory
+        self.ttl = ttl
+        self.max_stale = max(max_stale, ttl)
+        self.max_bytes = max_bytes
+        directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, repo: str) -> Path:
+        # Hash the repository name. Registry hosts and paths are not valid file
+        # names on every platform, and the hash keeps the directory flat.
+        digest = hashlib.sha256(repo.encode("utf-8")).hexdigest()
+        return self.directory / f"{digest[:32]}.json"
+
+    def get(self, repo: str) -> CachedTags | None:
+        path = self._path(repo)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+        age = time.time() - entry.get("stored_at", 0)
+        if age > self.max_stale:
+            path.unlink(missing_ok=True)
+            return None
+
+        # The modification time records the last use for LRU eviction.
+        os.utime(path)
+        return CachedTags(
+            tags=entry["tags"], stored_at=entry["stored_at"], fresh=age <= self.ttl
+        )
+
+    def put(self, repo: str, tags: list[str]) -> None:
+        entry = {"repo": repo, "stored_at": time.time(), "tags": tags}
+        # Write through a temporary file. Concurrent lookups and interrupted
+        # runs never leave a partial entry.
+        fd, tmp_name = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as tmp:
+            json.dump(entry, tmp)
+        os.replace(tmp_name, self._path(repo))
+
+    def prune(self) -> None:
+        now = time.time()
+        entries: list[tuple[float, int, Path]] = []
+        for path in self.directory.glob("*.json"):
+            try:
+                entry = json.loads(path.read_text(encoding="utf-8"))
+                stat = path.stat()
+            except (OSError, ValueError):
+                path.unlink(missing_ok=True)
+                continue
+
+            if now - entry.get("stored_at", 0) > self.max_stale:
+                path.unlink(missing_ok=True)
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+
+class CachedTagLister:
+    """Wrap a ``tag_lister`` with a ``TagCache`` and stale-while-revalidate.
+
+    A fresh entry answers without a registry request. For a stale entry, the
+    lookup starts a revalidation and waits up to ``revalidate_timeout``
+    seconds. A slow registry then does not block the run. The lookup returns
+    the stale tags, and the revalidation stores its result in the background.
+    ``close`` waits for pending revalidations and prunes the cache.
+
+    ``tag_lister`` returns an empty list on failure, so empty results are not
+    stored and do not replace stale tags.
+    """
+
+    def __init__(
+        self,
+        tag_lister: Callable[[str], list[str]],
+        cache: TagCache,
+        revalidate_timeout: float = DEFAULT_REVALIDATE_TIMEOUT,
+    ) -> None:
+        self.tag_lister = tag_lister
+        self.cache = cache
+        self.revalidate_timeout = revalidate_timeout
+        self._executor = ThreadPoolExecutor(thread_name_prefix="revalidate")
+
+    def __call__(self, repo: str) -> list[str]:
+        cached = self.cache.get(repo)
+        if cached is not None and cached.fresh:
+            return cached.tags
+
+        if cached is None:
+            return self._refresh(repo)
+
+        future = self._executor.submit(self._refresh, repo)
+        try:
+            tags = future.result(timeout=self.revalidate_timeout)
+        except FutureTimeoutError:
+            print(f"Use cached tags for {repo} while the registry responds.")
+            return cached.tags
+        return tags or cached.tags
+
+    def _refresh(self, repo: str) -> list[str]:
+        tags = self.tag_lister(repo)
+        if tags:
+            self.cache.put(repo, tags)
+        return tags
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        self.cache.prune()
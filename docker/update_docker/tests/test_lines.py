@@ -0,0 +1,53 @@
+import random
+import unittest
+
+from update_docker.lines import LineIndex
+
+
+class TestLineIndex(unittest.TestCase):
+    def test_line_number_matches_newline_count(self):
+        rng = random.Random(5)
+        text = "".join(rng.choice(["a", "b", "\n", " "]) for _ in range(2000))
+        lines = LineIndex(text)
+        for offset in range(len(text)):
+            self.assertEqual(lines.line_number(offset), text.count("\n", 0, offset) + 1)
+
+    def test_lines_match_splitlines(self):
+        for text in ["", "a", "a\n", "a\nb", "a\n\nb\n", "\n"]:
+            lines = LineIndex(text)
+            expected = text.splitlines(keepends=True)
+            self.assertEqual(len(lines), len(expected), repr(text))
+            self.assertEqual(
+                [lines.line(number) for number in range(1, len(lines) + 1)],
+                expected,
+            )
+            self.assertIsNone(lines.line(0))
+            self.assertIsNone(lines.line(len(lines) + 1))
+
+    def test_only_newlines_end_lines(self):
+        lines = LineIndex("a\x0cb\u2028c\nd\n")
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(lines.line(1), "a\x0cb\u2028c\n")
+        self.assertEqual(lines.line_number(4), 1)
+
+    def test_splice_replaces_lines_in_one_join(self):
+        lines = LineIndex("one\ntwo\nthree")
+        self.assertEqual(lines.splice({3: "3", 1: "first\n"}), "first\ntwo\n3")
+        self.assertEqual(lines.splice({2: "second line\n"}), "one\nsecond line\nthree")
+        self.assertEqual(lines.splice({}), lines.text)
+        self.assertEqual(lines.text, "one\ntwo\nthree")
+
+    def test_splice_matches_splitlines_edit(self):
+        rng = random.Random(7)
+        text = "".join(rng.choice(["ab", "c", "\n"]) for _ in range(500))
+        lines = LineIndex(text)
+        expected = text.splitlines(keepends=True)
+        numbers = rng.sample(range(1, len(lines) + 1), 20)
+        replacements = {number: f"<{number}>\n" for number in numbers}
+        for number, new_line in replacements.items():
+            expected[number - 1] = new_line
+        self.assertEqual(lines.splice(replacements), "".join(expected))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,168 @@
+import json
+import threading
+import unittest
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from update_docker.registry import RegistryClient, parse_challenge, registry_of
+
+
+# Stand-in repositories by path, with tags in registry order.
+REPOSITORIES = {
+    "library/rust": ["1.93-alpine", "1.94-alpine", "1.95-alpine", "latest"],
+    "o/app": ["v1.0.0", "v1.1.0", "v2.0.0"],
+}
+
+
+class RegistryHandler(BaseHTTPRequestHandler):
+    # Keep connections open between requests, as registries do.
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        server.connections.add(self.client_address)
+        parts = urllib.parse.urlsplit(self.path)
+        query = dict(urllib.parse.parse_qsl(parts.query))
+        if parts.path == "/token":
+            server.token_requests.append(query)
+            self._send(200, {"token": f"token:{query.get('scope', '')}"})
+            return
+
+        repo = parts.path[len("/v2/") : -len("/tags/list")]
+        scope = f"repository:{repo}:pull" if server.scoped else ""
+        if self.headers.get("Authorization") != f"Bearer token:{scope}":
+            server.challenges += 1
+            challenge = f'Bearer realm="{server.url}/token",service="test"'
+            if server.scoped:
+                challenge += f',scope="{scope}"'
+            self._send(401, {"errors": []}, {"WWW-Authenticate": challenge})
+            return
+
+        tags = REPOSITORIES.get(repo)
+        if tags is None:
+            self._send(404, {"errors": [{"code": "NAME_UNKNOWN"}]})
+            return
+
+        server.pages.append(query)
+        page_size = int(query.get("n", len(tags)))
+        start = tags.index(query["last"]) + 1 if "last" in query else 0
+        page = tags[start : start + page_size]
+        headers = {}
+        if server.links and start + page_size < len(tags):
+            next_query = urllib.parse.urlencode({"n": page_size, "last": page[-1]})
+            headers["Link"] = f'</v2/{repo}/tags/list?{next_query}>; rel="next"'
+        self._send(200, {"name": repo, "tags": page}, headers)
+
+    def _send(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestRegistryClient(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), RegistryHandler)
+        self.server.url = f"http://127.0.0.1:{self.server.server_port}"
+        self.server.connections = set()
+        self.server.token_requests = []
+        self.server.pages = []
+        self.server.challenges = 0
+        self.server.scoped = True
+        self.server.links = False
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        self.registry = f"127.0.0.1:{self.server.server_port}"
+        self.client = RegistryClient(page_size=2)
+        self.addCleanup(self.client.close)
+
+    def test_registry_of(self):
+        self.assertEqual(registry_of("library/rust"), "docker.io")
+        self.assertEqual(registry_of("getmeili/meilisearch"), "docker.io")
+        self.assertEqual(registry_of("ghcr.io/o/r"), "ghcr.io")
+        self.assertEqual(registry_of("localhost:5000/r"), "localhost:5000")
+
+    def test_parse_challenge(self):
+        scheme, params = parse_challenge(
+            'Bearer realm="https://auth.docker.io/token",service="registry.docker.io"'
+        )
+        self.assertEqual(scheme, "bearer")
+        self.assertEqual(params["realm"], "https://auth.docker.io/token")
+        self.assertEqual(params["service"], "registry.docker.io")
+
+    def test_follows_last_pagination(self):
+        tags = self.client.list_tags(f"{self.registry}/library/rust")
+
+        self.assertEqual(tags, REPOSITORIES["library/rust"])
+        self.assertEqual(
+            self.server.pages,
+            [
+                {"n": "2"},
+                {"n": "2", "last": "1.94-alpine"},
+                {"n": "2", "last": "latest"},
+            ],
+        )
+
+    def test_follows_link_header(self):
+        self.server.links = True
+        tags = self.client.list_tags(f"{self.registry}/o/app")
+
+        self.assertEqual(tags, REPOSITORIES["o/app"])
+        self.assertEqual(len(self.server.pages), 2)
+
+    def test_iter_tags_streams_pages(self):
+        tags = self.client.iter_tags(f"{self.registry}/library/rust")
+        self.assertEqual(next(tags), "1.93-alpine")
+        self.assertEqual(len(self.server.pages), 1)
+
+    def test_reuses_connection_and_tokens(self):
+        self.client.list_tags(f"{self.registry}/library/rust")
+        self.client.list_tags(f"{self.registry}/library/rust")
+        self.client.list_tags(f"{self.registry}/o/app")
+
+        # One challenge for the registry. Later repositories request a token
+        # directly. The second listing reuses the cached token.
+        self.assertEqual(self.server.challenges, 1)
+        self.assertEqual(
+            [request["scope"] for request in self.server.token_requests],
+            ["repository:library/rust:pull", "repository:o/app:pull"],
+        )
+        self.assertEqual(len(self.server.connections), 1)
+
+    def test_unscoped_realm_shares_one_token(self):
+        self.server.scoped = False
+        self.client.list_tags(f"{self.registry}/library/rust")
+        self.client.list_tags(f"{self.registry}/o/app")
+
+        self.assertEqual(self.server.token_requests, [{"service": "test"}])
+
+    def test_missing_repository_returns_empty_list(self):
+        with mock.patch("sys.stderr") as stderr:
+            tags = self.client.list_tags(f"{self.registry}/o/missing")
+
+        self.assertEqual(tags, [])
+        output = "".join(call.args[0] for call in stderr.write.call_args_list)
+        self.assertIn("::warning::Failed to list tags for", output)
+        self.assertIn("repository not found", output)
+
+    def test_unreachable_registry_returns_empty_list(self):
+        self.server.shutdown()
+        self.server.server_close()
+        with mock.patch("update_docker.registry.time.sleep"):
+            with mock.patch("sys.stderr"):
+                self.assertEqual(self.client.list_tags(f"{self.registry}/o/app"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,8 @@
+import random
 import tempfile
 import unittest
 from pathlib import Path
+from unittest import mock
 
 from update_docker import scanner
 
@@ -170,6 +172,178 @@ class TestScanCompose(unittest.TestCase):
         self.assertIn("image: redis:7.4", updated)
 
 
+class TestApplyTagEdits(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = Path(self.tmp.name)
+
+    def test_many_compose_edits_match_single_edits(self):
+        path = self.root / "docker-compose.yml"
+        lines = ["services:\n"]
+        for index in range(60):
+            image = "redis:7.2" if index % 2 else f"ghcr.io/o/app-{index}:1.0"
+            quote = "'" if index % 3 == 0 else ""
+            lines.append(f"  service-{index}:\n")
+            lines.append(f"    image: {quote}{image}{quote} # pinned\n")
+        path.write_text("".join(lines), encoding="utf-8")
+        text = path.read_text(encoding="utf-8")
+        edits = [
+            (ref, "7.4" if ref.tag == "7.2" else "2.0")
+            for ref in scanner.scan_compose(path)
+        ]
+        self.assertEqual(len(edits), 60)
+
+        expected = text
+        for ref, new_tag in edits:
+            expected = scanner.replace_compose_tag(expected, ref, new_tag)
+        random.Random(0).shuffle(edits)
+
+        self.assertEqual(scanner.apply_tag_edits(text, edits), expected)
+        self.assertNotIn("redis:7.2", expected)
+        self.assertNotIn(":1.0", expected)
+
+    def test_dockerfile_lines_break_only_at_newlines(self):
+        for separator in ["\x0c", "\u2028", "\x1c"]:
+            with self.subTest(separator=repr(separator)):
+                path = self.root / "Dockerfile"
+                path.write_text(
+                    f"# build {separator} notes\nFROM node:20\nFROM redis:7.2\n",
+                    encoding="utf-8",
+                )
+                text = path.read_text(encoding="utf-8")
+                node, redis = scanner.scan_dockerfile(path)
+                self.assertEqual([node.line_number, redis.line_number], [2, 3])
+
+                updated = scanner.apply_tag_edits(text, [(node, "22"), (redis, "7.4")])
+
+                self.assertEqual(
+                    updated,
+                    f"# build {separator} notes\nFROM node:22\nFROM redis:7.4\n",
+                )
+
+    def test_dockerfile_edits_keep_unmatched_lines(self):
+        path = self.root / "Dockerfile"
+        path.write_text(
+            "FROM rust:1.94-alpine AS builder\r\n"
+            "FROM builder\r\n"
+            "FROM redis:7.2\r\n",
+            encoding="utf-8",
+        )
+        text = path.read_text(encoding="utf-8")
+        rust, redis = scanner.scan_dockerfile(path)
+        stale = scanner.ImageRef(
+            source_path=path,
+            line_number=9,
+            source_kind="dockerfile",
+            registry="docker.io",
+            repo="library/node",
+            tag="22",
+        )
+
+        updated = scanner.apply_tag_edits(
+            text, [(redis, "7.4"), (stale, "24"), (rust, "1.95-alpine")]
+        )
+
+        self.assertEqual(
+            updated,
+            "FROM rust:1.95-alpine AS builder\nFROM builder\nFROM redis:7.4\n",
+        )
+        self.assertIs(scanner.apply_tag_edits(text, [(stale, "24")]), text)
+
+
+# Compose texts for differential tests of the node walk and the round-trip
+# loader.
+COMPOSE_TEXTS = [
+    'services:\n  app:\n    image: redis:7.2\n    command: "echo image: x"\n',
+    "x-default: &default\n"
+    "  image: redis:7.2\n"
+    "  build:\n"
+    "    image: node:22\n"
+    "services:\n"
+    "  cache:\n"
+    "    <<: *default\n"
+    "  api:\n"
+    "    <<: *default\n"
+    "    image: 'ghcr.io/o/api:1.0'\n"
+    "  worker: {<<: [*default]}\n",
+    "services:\n"
+    "  number:\n"
+    "    image: 123\n"
+    "  quoted:\n"
+    '    image: "123"\n'
+    "  tagged:\n"
+    "    image: !override redis:7\n"
+    "  block:\n"
+    "    image: |\n"
+    "      redis:7\n"
+    "  empty:\n"
+    "    image: null\n"
+    "  reset: !reset\n"
+    "    image: redis:7.4\n",
+    "- image: redis:7.2\n- [{image: 'node:22'}]\n",
+    "services:\n  app:\n    image: yes\n    1: {image: 'redis:7.2'}\n",
+    "",
+]
+
+
+class TestComposeEngines(unittest.TestCase):
+    def test_node_walk_matches_round_trip(self):
+        for text in COMPOSE_TEXTS:
+            with self.subTest(text=text):
+                self.assertEqual(
+                    scanner._compose_images(text),
+                    scanner._round_trip_images(Path("docker-compose.yml"), text),
+                )
+
+    def test_falls_back_to_round_trip_loader(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = Path(tmp.name) / "docker-compose.yml"
+        # The C parser reads YAML 1.1 and rejects ``:`` in this flow scalar.
+        path.write_text("services:\n  app: {image: redis:7.2}\n", encoding="utf-8")
+        with self.assertRaises(Exception):
+            scanner._compose_images(path.read_text(encoding="utf-8"))
+
+        refs = scanner.scan_compose(path)
+
+        self.assertEqual(
+            [(r.repo, r.tag, r.line_number) for r in refs],
+            [("library/redis", "7.2", 2)],
+        )
+
+    def test_unicode_line_separators_keep_editor_lines(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = Path(tmp.name) / "docker-compose.yml"
+        path.write_text(
+            'x-note: "a \u2028 b"\nservices:\n  app:\n    image: redis:7.2\n',
+            encoding="utf-8",
+        )
+
+        ref = scanner.scan_compose(path)[0]
+
+        self.assertEqual(ref.line_number, 4)
+        updated = scanner.apply_tag_edits(
+            path.read_text(encoding="utf-8"), [(ref, "7.4")]
+        )
+        self.assertIn("image: redis:7.4", updated)
+
+    def test_duplicate_keys_warn_as_before(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = Path(tmp.name) / "docker-compose.yml"
+        path.write_text(
+            "services:\n  app:\n    image: redis:7.2\n    image: redis:7.4\n",
+            encoding="utf-8",
+        )
+        with mock.patch("sys.stderr") as stderr:
+            self.assertEqual(scanner.scan_compose(path), [])
+
+        output = "".join(call.args[0] for call in stderr.write.call_args_list)
+        self.assertIn("Failed to parse compose YAML", output)
+
+
 class TestMarkdown(unittest.TestCase):
     def setUp(self):
         self.tmp = tempfile.TemporaryDirectory()
@@ -200,6 +374,104 @@ class TestMarkdown(unittest.TestCase):
         self.assertIn(":1.1.0", updated)
         self.assertNotIn(":1.0.0", updated)
 
+    def test_find_markdown_occurrences_reports_lines(self):
+        path = self.root / "README.md"
+        path.write_text(
+            "# Images\n\nUse rust:1.94-alpine.\nNot my-rust:1.94-alpine.\n"
+            "Or docker.io/library/rust:1.94-alpine\n",
+            encoding="utf-8",
+        )
+        ref = self._ref("docker.io", "library/rust", "1.94-alpine")
+
+        found = list(scanner.find_markdown_occurrences(path, [ref]))
+
+        self.assertEqual([line for _, line in found], [3, 5])
+
+    def test_rewriter_replaces_many_updates_in_one_pass(self):
+        rust = self._ref("docker.io", "library/rust", "1.94-alpine")
+        redis = self._ref("docker.io", "library/redis", "7.2")
+        unused = self._ref("ghcr.io", "o/app", "1.0")
+        rewriter = scanner.MarkdownRewriter(
+            [(rust, "1.95-alpine"), (unused, "2.0"), (redis, "7.4")]
+        )
+        text = (
+            "Run redis:7.2, then docker.io/library/rust:1.94-alpine.\n"
+            "Keep my-redis:7.2 and redis:7.2-alpine.\n"
+        )
+
+        updated, matched = rewriter.rewrite(text)
+
+        self.assertEqual(
+            updated,
+            "Run redis:7.4, then docker.io/library/rust:1.95-alpine.\n"
+            "Keep my-redis:7.2 and redis:7.2-alpine.\n",
+        )
+        self.assertEqual(matched, [0, 2])
+
+    def test_rewriter_prefilters_files(self):
+        rust = self._ref("docker.io", "library/rust", "1.94-alpine")
+        app = self._ref("ghcr.io", "o/app", "1.0")
+        rewriter = scanner.MarkdownRewriter([(rust, "1.95-alpine"), (app, "2.0")])
+        files = {
+            "short.md": "Use rust:1.94-alpine.\n",
+            "full.md": "Use ghcr.io/o/app:1.0 here.\n",
+            "other.md": "Use rust:1.95-alpine and app:2.0.\n",
+            "empty.md": "",
+        }
+        for name, text in files.items():
+            (self.root / name).write_text(text, encoding="utf-8")
+
+        self.assertTrue(rewriter.may_match_file(self.root / "short.md"))
+        self.assertTrue(rewriter.may_match_file(self.root / "full.md"))
+        self.assertFalse(rewriter.may_match_file(self.root / "other.md"))
+        self.assertFalse(rewriter.may_match_file(self.root / "empty.md"))
+        empty = scanner.MarkdownRewriter([])
+        self.assertFalse(empty.may_match_file(self.root / "short.md"))
+
+    def test_rewriter_prefers_longest_needle(self):
+        short = self._ref("ghcr.io", "o/app", "1")
+        long = self._ref("ghcr.io", "o/app", "1.2")
+        rewriter = scanner.MarkdownRewriter([(short, "2"), (long, "2.0")])
+
+        updated, _ = rewriter.rewrite("ghcr.io/o/app:1.2 and ghcr.io/o/app:1.\n")
+
+        self.assertEqual(updated, "ghcr.io/o/app:2.0 and ghcr.io/o/app:2.\n")
+
+    def test_rewriter_matches_sequential_replacement(self):
+        refs = [
+            (self._ref("docker.io", "library/rust", "1.94-alpine"), "1.95-alpine"),
+            (self._ref("docker.io", "library/node", "20"), "22"),
+            (self._ref("docker.io", "getmeili/meilisearch", "v1.42.1"), "v1.43.0"),
+            (self._ref("public.ecr.aws", "o/lambda", "1.0.0"), "1.1.0"),
+        ]
+        words = [
+            "rust:1.94-alpine",
+            "rust:1.94-alpine3",
+            "my-rust:1.94-alpine",
+            "docker.io/library/rust:1.94-alpine",
+            "node:20",
+            "node:20.1",
+            "node:200",
+            "(node:20)",
+            "getmeili/meilisearch:v1.42.1",
+            "public.ecr.aws/o/lambda:1.0.0",
+            "x/public.ecr.aws/o/lambda:1.0.0",
+            "text",
+            "`node:20`",
+        ]
+        rng = random.Random(3)
+        separators = [" ", "\n", ", ", ". ", "`"]
+        text = "".join(rng.choice(words) + rng.choice(separators) for _ in range(500))
+
+        expected = text
+        for ref, new_tag in refs:
+            for needle in scanner._ref_needles(ref):
+                replacement = needle[: -len(ref.tag)] + new_tag
+                expected = scanner._markdown_pattern(needle).sub(replacement, expected)
+
+        updated, _ = scanner.MarkdownRewriter(refs).rewrite(text)
+        self.assertEqual(updated, expected)
+
 
 if __name__ == "__main__":
     unittest.main()
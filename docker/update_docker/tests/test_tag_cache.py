@@ -0,0 +1,125 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from update_docker.tag_cache import CachedTagLister, TagCache
+
+
+class TestTagCache(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = Path(tmp.name)
+
+    def test_round_trip(self):
+        cache = TagCache(self.directory)
+        cache.put("library/rust", ["1.94-alpine", "1.95-alpine"])
+        cached = cache.get("library/rust")
+        self.assertEqual(cached.tags, ["1.94-alpine", "1.95-alpine"])
+        self.assertTrue(cached.fresh)
+        self.assertIsNone(cache.get("library/node"))
+
+    def test_entry_turns_stale_then_expires(self):
+        cache = TagCache(self.directory, ttl=60, max_stale=3600)
+        cache.put("library/rust", ["1.94"])
+        now = time.time()
+
+        with mock.patch("update_docker.tag_cache.time.time", return_value=now + 120):
+            self.assertFalse(cache.get("library/rust").fresh)
+
+        with mock.patch("update_docker.tag_cache.time.time", return_value=now + 7200):
+            self.assertIsNone(cache.get("library/rust"))
+        self.assertEqual(list(self.directory.glob("*.json")), [])
+
+    def test_prune_removes_least_recently_used_entries(self):
+        cache = TagCache(self.directory)
+        for repo in ["a/a", "b/b", "c/c"]:
+            cache.put(repo, ["1.0"])
+        paths = {repo: cache._path(repo) for repo in ["a/a", "b/b", "c/c"]}
+        for age, repo in enumerate(["c/c", "a/a", "b/b"]):
+            stamp = time.time() - 100 * (age + 1)
+            os.utime(paths[repo], (stamp, stamp))
+        cache.max_bytes = sum(paths[repo].stat().st_size for repo in ["a/a", "c/c"])
+
+        cache.prune()
+
+        self.assertIsNotNone(cache.get("a/a"))
+        self.assertIsNotNone(cache.get("c/c"))
+        self.assertIsNone(cache.get("b/b"))
+
+    def test_prune_removes_corrupt_entries(self):
+        cache = TagCache(self.directory)
+        (self.directory / "broken.json").write_text("{", encoding="utf-8")
+        cache.prune()
+        self.assertFalse((self.directory / "broken.json").exists())
+
+
+class TestCachedTagLister(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.cache = TagCache(Path(tmp.name), ttl=60)
+
+    def make_stale(self, repo, tags):
+        stored_at = time.time() - 120
+        with mock.patch("update_docker.tag_cache.time.time", return_value=stored_at):
+            self.cache.put(repo, tags)
+
+    def test_fresh_entry_skips_lister(self):
+        self.cache.put("library/rust", ["1.94"])
+        lister = mock.Mock(return_value=["1.95"])
+        cached_lister = CachedTagLister(lister, self.cache)
+
+        self.assertEqual(cached_lister("library/rust"), ["1.94"])
+        cached_lister.close()
+        lister.assert_not_called()
+
+    def test_miss_calls_lister_and_stores_tags(self):
+        lister = mock.Mock(return_value=["1.95"])
+        cached_lister = CachedTagLister(lister, self.cache)
+
+        self.assertEqual(cached_lister("library/rust"), ["1.95"])
+        cached_lister.close()
+        self.assertEqual(self.cache.get("library/rust").tags, ["1.95"])
+
+    def test_stale_entry_revalidates(self):
+        self.make_stale("library/rust", ["1.94"])
+        cached_lister = CachedTagLister(lambda repo: ["1.95"], self.cache)
+
+        self.assertEqual(cached_lister("library/rust"), ["1.95"])
+        cached_lister.close()
+        self.assertTrue(self.cache.get("library/rust").fresh)
+
+    def test_slow_registry_serves_stale_tags(self):
+        self.make_stale("library/rust", ["1.94"])
+        release = threading.Event()
+
+        def slow_lister(repo):
+            release.wait(5)
+            return ["1.95"]
+
+        cached_lister = CachedTagLister(
+            slow_lister, self.cache, revalidate_timeout=0.01
+        )
+        with mock.patch("sys.stdout"):
+            self.assertEqual(cached_lister("library/rust"), ["1.94"])
+
+        release.set()
+        cached_lister.close()
+        self.assertEqual(self.cache.get("library/rust").tags, ["1.95"])
+
+    def test_failed_revalidation_keeps_stale_tags(self):
+        self.make_stale("library/rust", ["1.94"])
+        cached_lister = CachedTagLister(lambda repo: [], self.cache)
+
+        self.assertEqual(cached_lister("library/rust"), ["1.94"])
+        cached_lister.close()
+        self.assertFalse(self.cache.get("library/rust").fresh)
+
+
+if __name__ == "__main__":
+    unittest.main()
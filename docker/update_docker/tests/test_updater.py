@@ -1,9 +1,15 @@
+import io
 import os
 import tempfile
+import threading
+import time
 import unittest
 from pathlib import Path
+from unittest import mock
 
-from update_docker.updater import update_docker
+from update_docker.registry import registry_of
+from update_docker.tag_cache import CachedTagLister, TagCache
+from update_docker.updater import RegistryLimiter, fetch_all_tags, update_docker
 
 
 ACTION = Path(__file__).parents[2] / "action.yml"
@@ -107,6 +113,24 @@ class TestUpdater(unittest.TestCase):
         self.assertIn("rust:1.95-alpine", text)
         self.assertIn("getmeili/meilisearch:v2.0.0", text)
 
+    def test_markdown_skips_files_without_candidates(self):
+        (self.root / "README.md").write_text(
+            "We pin rust:1.94-alpine.\n", encoding="utf-8"
+        )
+        (self.root / "NOTES.md").write_text("No images here.\n", encoding="utf-8")
+
+        with mock.patch("sys.stdout", new_callable=io.StringIO) as stdout:
+            self.assertEqual(self._run(markdown_glob="**/*.md"), 0)
+
+        self.assertIn(
+            "Markdown files: 1 scanned, 1 skipped without a candidate reference.",
+            stdout.getvalue(),
+        )
+        self.assertIn(
+            "rust:1.95-alpine",
+            (self.root / "README.md").read_text(encoding="utf-8"),
+        )
+
     def test_emits_github_output(self):
         with tempfile.NamedTemporaryFile("w+", delete=False) as out:
             out_path = out.name
@@ -126,6 +150,102 @@ class TestUpdater(unittest.TestCase):
         self.assertIn("ENDOFUPDATES", contents)
         self.assertIn("rust:1.94-alpine\t1.94-alpine\t1.95-alpine", contents)
 
+    def test_cache_dir_reuses_tag_lists(self):
+        calls = []
+
+        def lister(repo):
+            calls.append(repo)
+            return fake_lister(repo)
+
+        cache_dir = self.root / ".cache"
+        self._run(dry_run=True, tag_lister=lister, cache_dir=cache_dir)
+        first_run = len(calls)
+        self._run(dry_run=True, tag_lister=lister, cache_dir=cache_dir)
+
+        self.assertEqual(first_run, 4)
+        self.assertEqual(len(calls), first_run)
+
+
+class TestFetchAllTags(unittest.TestCase):
+    def test_limits_concurrency_per_registry(self):
+        repos = [f"library/image-{i}" for i in range(6)] + [
+            f"ghcr.io/o/image-{i}" for i in range(6)
+        ]
+        lock = threading.Lock()
+        active: dict[str, int] = {}
+        peaks: dict[str, int] = {}
+
+        def lister(repo):
+            registry = registry_of(repo)
+            with lock:
+                active[registry] = active.get(registry, 0) + 1
+                peaks[registry] = max(peaks.get(registry, 0), active[registry])
+                total = sum(active.values())
+                peaks["total"] = max(peaks.get("total", 0), total)
+            time.sleep(0.02)
+            with lock:
+                active[registry] -= 1
+            return [repo]
+
+        tags = fetch_all_tags(repos, lister, max_concurrency=5, registry_concurrency=2)
+
+        self.assertEqual(list(tags), repos)
+        self.assertEqual(tags["ghcr.io/o/image-3"], ["ghcr.io/o/image-3"])
+        self.assertLessEqual(peaks["docker.io"], 2)
+        self.assertLessEqual(peaks["ghcr.io"], 2)
+        self.assertLessEqual(peaks["total"], 5)
+        self.assertGreater(peaks["total"], 1)
+
+    def test_revalidation_keeps_registry_limit(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        cache = TagCache(Path(tmp.name), ttl=60)
+        repos = [f"library/image-{i}" for i in range(12)]
+        with mock.patch(
+            "update_docker.tag_cache.time.time", return_value=time.time() - 120
+        ):
+            for repo in repos:
+                cache.put(repo, ["1.0"])
+
+        lock = threading.Lock()
+        active = 0
+        peak = 0
+
+        def slow_lister(repo):
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.05)
+            with lock:
+                active -= 1
+            return ["2.0"]
+
+        # Lookups give up on the registry at once and return stale tags while
+        # the revalidations keep running.
+        cached_lister = CachedTagLister(
+            RegistryLimiter(slow_lister, 2), cache, revalidate_timeout=0
+        )
+        with mock.patch("sys.stdout"):
+            tags = fetch_all_tags(
+                repos, cached_lister, max_concurrency=8, registry_concurrency=None
+            )
+        cached_lister.close()
+
+        self.assertEqual(tags[repos[0]], ["1.0"])
+        self.assertEqual(peak, 2)
+        self.assertEqual(cache.get(repos[-1]).tags, ["2.0"])
+
+    def test_serial_lookup_keeps_order(self):
+        calls = []
+
+        def lister(repo):
+            calls.append(repo)
+            return []
+
+        fetch_all_tags(["b/b", "a/a"], lister, max_concurrency=1)
+        self.assertEqual(calls, ["b/b", "a/a"])
+
 
 if __name__ == "__main__":
     unittest.main()
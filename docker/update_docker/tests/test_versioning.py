@@ -1,8 +1,28 @@
+import random
 import unittest
 
 from update_docker import versioning
 
 
+def select_latest_linear(tags, current):
+    # The selection before VariantIndex, for differential tests.
+    best_tag = None
+    best_version = None
+    for tag in tags:
+        variant = versioning.parse_image_tag(tag)
+        if variant is None:
+            continue
+        if variant.prefix != current.prefix or variant.suffix != current.suffix:
+            continue
+        version = variant.version
+        if version <= current.version:
+            continue
+        if best_version is None or version > best_version:
+            best_version = version
+            best_tag = tag
+    return best_tag
+
+
 class TestParseImageTag(unittest.TestCase):
     def test_plain_semver(self):
         v = versioning.parse_image_tag("1.42.1")
@@ -80,6 +100,49 @@ class TestSelectLatestMatching(unittest.TestCase):
         )
 
 
+class TestVariantIndex(unittest.TestCase):
+    def test_groups_by_prefix_and_suffix(self):
+        index = versioning.VariantIndex(
+            ["1.94-alpine", "1.96-slim", "1.95-alpine", "v2.0-alpine", "latest"]
+        )
+        self.assertEqual(len(index), 4)
+        current = versioning.parse_image_tag("1.94-alpine")
+        self.assertEqual(index.latest_matching(current), "1.95-alpine")
+        current = versioning.parse_image_tag("1.95-alpine")
+        self.assertIsNone(index.latest_matching(current))
+        current = versioning.parse_image_tag("1.0-bookworm")
+        self.assertIsNone(index.latest_matching(current))
+
+    def test_first_tag_wins_for_equal_versions(self):
+        index = versioning.VariantIndex(["1.95-alpine", "1.95.0-alpine"])
+        current = versioning.parse_image_tag("1.94-alpine")
+        self.assertEqual(index.latest_matching(current), "1.95-alpine")
+
+    def test_matches_linear_selection(self):
+        rng = random.Random(7)
+        suffixes = ["", "-alpine", "-slim-bookworm", "-alpine3.20"]
+        tags = []
+        for _ in range(400):
+            numeric = ".".join(
+                str(rng.randint(0, 12)) for _ in range(rng.randint(1, 3))
+            )
+            prefix = rng.choice(["", "", "v"])
+            tags.append(f"{prefix}{numeric}{rng.choice(suffixes)}")
+        tags.extend(["latest", "nightly", "vault"])
+        rng.shuffle(tags)
+
+        index = versioning.VariantIndex(tags)
+        for tag in tags[:100]:
+            current = versioning.parse_image_tag(tag)
+            if current is None:
+                continue
+            self.assertEqual(
+                index.latest_matching(current),
+                select_latest_linear(tags, current),
+                tag,
+            )
+
+
 class TestGranularizeTag(unittest.TestCase):
     def test_major_only(self):
         self.assertEqual(
@@ -1,27 +1,109 @@
 from __future__ import annotations
 
+import itertools
 import os
+import threading
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Callable
 
 from update_docker.crane import crane_list
+from update_docker.registry import registry_of
+from update_docker.tag_cache import DEFAULT_TTL_SECONDS, CachedTagLister, TagCache
 from update_docker.scanner import (
     ImageRef,
-    replace_compose_tag,
-    replace_dockerfile_tag,
-    replace_markdown_occurrences,
+    MarkdownRewriter,
+    apply_tag_edits,
     scan_compose_files,
     scan_dockerfiles,
     collect_files,
 )
 from update_docker.versioning import (
+    VariantIndex,
     granularize_tag,
     parse_image_tag,
-    select_latest_matching,
 )
 
 
+DEFAULT_MAX_CONCURRENCY = 8
+
+# "crane" runs ``crane ls`` per repository. "registry" lists tags with the
+# built-in Registry V2 client over pooled connections.
+TAG_SOURCES = ("crane", "registry")
+
+# Docker Hub limits token and manifest requests per client address. Keep the
+# number of concurrent lookups against one registry lower than the total.
+DEFAULT_REGISTRY_CONCURRENCY = 4
+
+
+class RegistryLimiter:
+    """Wrap a ``tag_lister`` so at most ``concurrency`` calls per registry run.
+
+    Every caller shares the limit, including background revalidations of a
+    ``CachedTagLister`` that wraps this limiter. The limiter is safe to share
+    between threads.
+    """
+
+    def __init__(
+        self, tag_lister: Callable[[str], list[str]], concurrency: int
+    ) -> None:
+        self.tag_lister = tag_lister
+        self.concurrency = concurrency
+        self._lock = threading.Lock()
+        self._limits: dict[str, threading.BoundedSemaphore] = {}
+
+    def __call__(self, repo: str) -> list[str]:
+        registry = registry_of(repo)
+        with self._lock:
+            limit = self._limits.get(registry)
+            if limit is None:
+                limit = threading.BoundedSemaphore(self.concurrency)
+                self._limits[registry] = limit
+        with limit:
+            return self.tag_lister(repo)
+
+
+def fetch_all_tags(
+    crane_repos: list[str],
+    tag_lister: Callable[[str], list[str]] = crane_list,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    registry_concurrency: int | None = DEFAULT_REGISTRY_CONCURRENCY,
+) -> dict[str, list[str]]:
+    """List the tags of each repository with bounded concurrency.
+
+    At most ``max_concurrency`` lookups run at once, and at most
+    ``registry_concurrency`` of them against the same registry. Pass None
+    when ``tag_lister`` already limits each registry, for example a
+    ``CachedTagLister`` around a ``RegistryLimiter``. The result keeps the
+    order of ``crane_repos``, so later output stays deterministic.
+    """
+    if max_concurrency <= 1 or len(crane_repos) <= 1:
+        return {repo: tag_lister(repo) for repo in crane_repos}
+
+    by_registry: dict[str, list[str]] = defaultdict(list)
+    for repo in crane_repos:
+        by_registry[registry_of(repo)].append(repo)
+    lookup = tag_lister
+    if registry_concurrency is not None:
+        lookup = RegistryLimiter(tag_lister, registry_concurrency)
+
+    # Alternate between registries. A worker that waits for a busy registry
+    # then rarely blocks lookups against another one.
+    order = [
+        repo
+        for group in itertools.zip_longest(*by_registry.values())
+        for repo in group
+        if repo is not None
+    ]
+    workers = min(max_concurrency, len(crane_repos))
+    # Each lookup waits on the network or a crane process, so threads are
+    # sufficient.
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        tags = dict(zip(order, pool.map(lookup, order)))
+    return {repo: tags[repo] for repo in crane_repos}
+
+
 def _is_excluded(ref: ImageRef, excluded: set[str]) -> bool:
     if not excluded:
         return False
@@ -45,6 +127,10 @@ def update_docker(
     excluded_images: list[str],
     dry_run: bool,
     tag_lister: Callable[[str], list[str]] = crane_list,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    registry_concurrency: int = DEFAULT_REGISTRY_CONCURRENCY,
+    cache_dir: Path | None = None,
+    cache_ttl: float = DEFAULT_TTL_SECONDS,
 ) -> int:
     excluded = {item for item in excluded_images if item}
 
@@ -60,9 +146,27 @@ def update_docker(
         print("No Docker image references found.")
         return 0
 
-    # Cache crane lookups. Each (registry, repository) pair uses the registry
-    # only once per run.
-    tag_cache: dict[str, list[str]] = {}
+    # Look up each (registry, repository) pair once, concurrently, before
+    # planning updates. Skip references whose tags cannot be updated.
+    lookup_repos: dict[str, None] = {}
+    for ref in refs:
+        if parse_image_tag(ref.tag) is not None:
+            lookup_repos.setdefault(ref.crane_repo)
+    # Limit the registry calls themselves. With a cache directory, fresh tag
+    # lists come from disk. Stale lists are revalidated and used while a slow
+    # registry responds. A revalidation that outlives its lookup still holds
+    # a registry slot.
+    tag_lister = RegistryLimiter(tag_lister, registry_concurrency)
+    cached_lister = None
+    if cache_dir is not None:
+        cached_lister = CachedTagLister(tag_lister, TagCache(cache_dir, cache_ttl))
+        tag_lister = cached_lister
+    repo_tags = fetch_all_tags(
+        list(lookup_repos), tag_lister, max_concurrency, registry_concurrency=None
+    )
+    # Parse each tag list once. Many references share a repository with
+    # different variants.
+    tag_indexes = {repo: VariantIndex(tags) for repo, tags in repo_tags.items()}
     new_tag_for: dict[tuple[str, str, str], str] = {}
     update_records: list[tuple[ImageRef, str]] = []
 
@@ -79,11 +183,7 @@ def update_docker(
                 seen_decision[key] = None
                 continue
 
-            if ref.crane_repo not in tag_cache:
-                tag_cache[ref.crane_repo] = tag_lister(ref.crane_repo)
-            tags = tag_cache[ref.crane_repo]
-
-            latest = select_latest_matching(tags, current)
+            latest = tag_indexes[ref.crane_repo].latest_matching(current)
             if latest is None:
                 print(f"::notice::No newer tags found for {ref.display}")
                 seen_decision[key] = None
@@ -103,8 +203,8 @@ def update_docker(
 
         update_records.append((ref, new_tag))
 
-    # Group writes by file. Read and write each file at most once when multiple
-    # references have the same path.
+    # Group writes by file. Read, split, and write each file at most once when
+    # multiple references have the same path.
     by_file: dict[Path, list[tuple[ImageRef, str]]] = defaultdict(list)
     for ref, new_tag in update_records:
         by_file[ref.source_path].append((ref, new_tag))
@@ -112,16 +212,7 @@ def update_docker(
     changed_files: list[Path] = []
     for path, items in by_file.items():
         original = path.read_text(encoding="utf-8")
-        updated = original
-        # Replace from the file end. Dockerfile and compose line numbers stay
-        # stable across changes.
-        for ref, new_tag in sorted(
-            items, key=lambda item: item[0].line_number, reverse=True
-        ):
-            if ref.source_kind == "dockerfile":
-                updated = replace_dockerfile_tag(updated, ref, new_tag)
-            elif ref.source_kind == "compose":
-                updated = replace_compose_tag(updated, ref, new_tag)
+        updated = apply_tag_edits(original, items)
         if updated != original:
             changed_files.append(path)
             if dry_run:
@@ -137,24 +228,30 @@ def update_docker(
         for ref, new_tag in update_records:
             unique_updates.setdefault((ref.registry, ref.repo, ref.tag), (ref, new_tag))
 
+        # One combined matcher replaces every update in one pass per file.
+        markdown_updates = list(unique_updates.values())
+        rewriter = MarkdownRewriter(markdown_updates)
         markdown_files = collect_files(root, markdown_glob)
+        scanned = 0
         for path in markdown_files:
+            if not rewriter.may_match_file(path):
+                continue
+
+            scanned += 1
             original = path.read_text(encoding="utf-8")
-            updated = original
+            updated, matched = rewriter.rewrite(original)
             md_records: list[tuple[ImageRef, str]] = []
-            for (registry, repo, tag), (ref, new_tag) in unique_updates.items():
-                before = updated
-                updated = replace_markdown_occurrences(updated, ref, new_tag)
-                if updated != before:
-                    md_record_ref = ImageRef(
-                        source_path=path,
-                        line_number=0,
-                        source_kind="markdown",
-                        registry=registry,
-                        repo=repo,
-                        tag=tag,
-                    )
-                    md_records.append((md_record_ref, new_tag))
+            for index in matched:
+                ref, new_tag = markdown_updates[index]
+                md_record_ref = ImageRef(
+                    source_path=path,
+                    line_number=0,
+                    source_kind="markdown",
+                    registry=ref.registry,
+                    repo=ref.repo,
+                    tag=ref.tag,
+                )
+                md_records.append((md_record_ref, new_tag))
             if updated != original:
                 changed_files.append(path)
                 update_records.extend(md_records)
@@ -164,6 +261,12 @@ def update_docker(
                     path.write_text(updated, encoding="utf-8")
                     print(f"Updated {path}")
 
+        skipped = len(markdown_files) - scanned
+        print(
+            f"Markdown files: {scanned} scanned, {skipped} skipped without "
+            "a candidate reference."
+        )
+
     if dry_run:
         print(f"Dry run complete. Files with updates: {len(changed_files)}")
 
@@ -180,4 +283,7 @@ def update_docker(
                 output.write(f"{ref.display}\t{ref.tag}\t{new_tag}\t{rel}\n")
             output.write("ENDOFUPDATES\n")
 
+    if cached_lister is not None:
+        # Let background revalidations store their results for the next run.
+        cached_lister.close()
     return 0
@@ -1,6 +1,10 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+import functools
+import sys
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from typing import Iterable
 
 import semver
 
@@ -9,23 +13,37 @@ _SUFFIX_ALLOWED = set(
 )
 
 
-@dataclass(frozen=True)
+def _version_key(numeric: tuple[int, ...]) -> tuple[int, int, int]:
+    # Pad to (major, minor, patch). "1.94" compares as 1.94.0.
+    parts = numeric + (0,) * (3 - len(numeric))
+    return parts[0], parts[1], parts[2]
+
+
+@dataclass(frozen=True, slots=True)
 class TagVariant:
     prefix: str  # "" or "v".
     numeric: tuple[int, ...]
     suffix: str  # "" or, for example, "-alpine".
+    # The padded version tuple. Integer tuples compare faster than semver
+    # objects, so lookups compare this key.
+    key: tuple[int, int, int] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        # Many tags of a repository share a suffix. Keep one copy of each.
+        object.__setattr__(self, "suffix", sys.intern(self.suffix))
+        object.__setattr__(self, "key", _version_key(self.numeric))
 
     @property
     def version(self) -> semver.Version:
-        parts = list(self.numeric) + [0] * (3 - len(self.numeric))
-        return semver.Version(parts[0], parts[1], parts[2])
+        return semver.Version(*self.key)
 
 
+@functools.lru_cache(maxsize=65536)
 def parse_image_tag(tag: str) -> TagVariant | None:
     """Parse an image tag into prefix, numeric value, and suffix.
 
     ``latest``, ``nightly``, and ``edge`` return ``None``. The caller skips
-    these tags. The accepted shape is::
+    these tags. Each distinct tag is parsed once per process. The accepted shape is::
 
         [v]<num>(.<num>){0,2}[-<alnum>[<alnum.->...]]
 
@@ -68,32 +86,56 @@ def parse_image_tag(tag: str) -> TagVariant | None:
     )
 
 
-def select_latest_matching(tags: list[str], current: TagVariant) -> str | None:
-    """Return the highest tag with the prefix and suffix of ``current``.
+class VariantIndex:
+    """Image tags of one repository, grouped by prefix and suffix.
 
-    Ignore tags that do not parse or have a different prefix or suffix. This
-    prevents updates from ``rust:1.94-alpine`` to ``rust:1.95-slim-bookworm``.
+    Each tag is parsed once. Each group keeps its versions sorted. When tags
+    in a group share a version, the first tag in the input represents it, as
+    in the linear scan that ``select_latest_matching`` replaced. A lookup is
+    one dictionary access and one bisect.
     """
-    best_tag: str | None = None
-    best_version: semver.Version | None = None
 
-    for tag in tags:
-        variant = parse_image_tag(tag)
-        if variant is None:
-            continue
+    __slots__ = ("_groups",)
+
+    def __init__(self, tags: Iterable[str]) -> None:
+        by_variant: dict[tuple[str, str], dict[tuple[int, int, int], str]] = {}
+        for tag in tags:
+            variant = parse_image_tag(tag)
+            if variant is None:
+                continue
+            group = by_variant.setdefault((variant.prefix, variant.suffix), {})
+            group.setdefault(variant.key, tag)
+
+        self._groups: dict[
+            tuple[str, str], tuple[list[tuple[int, int, int]], list[str]]
+        ] = {}
+        for variant, group in by_variant.items():
+            keys = sorted(group)
+            self._groups[variant] = (keys, [group[key] for key in keys])
+
+    def __len__(self) -> int:
+        return sum(len(keys) for keys, _ in self._groups.values())
+
+    def latest_matching(self, current: TagVariant) -> str | None:
+        """Return the highest tag above ``current`` with its prefix and suffix."""
+        group = self._groups.get((current.prefix, current.suffix))
+        if group is None:
+            return None
 
-        if variant.prefix != current.prefix or variant.suffix != current.suffix:
-            continue
+        keys, tags = group
+        if bisect_right(keys, current.key) == len(keys):
+            return None
+        return tags[-1]
 
-        version = variant.version
-        if version <= current.version:
-            continue
 
-        if best_version is None or version > best_version:
-            best_version = version
-            best_tag = tag
+def select_latest_matching(tags: list[str], current: TagVariant) -> str | None:
+    """Return the highest tag with the prefix and suffix of ``current``.
 
-    return best_tag
+    Ignore tags that do not parse or have a different prefix or suffix. This
+    prevents updates from ``rust:1.94-alpine`` to ``rust:1.95-slim-bookworm``.
+    Build a ``VariantIndex`` once to look up many current tags in one list.
+    """
+    return VariantIndex(tags).latest_matching(current)
 
 
 def granularize_tag(current_tag: str, latest_tag: str) -> str: